@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+"""Time how long a fresh interpreter takes to import ceterach, and which of
+the slow third-party modules that drags in.
+
+Run it from the root of the repository, optionally with the number of
+interpreters to start for each statement: ::
+
+    $ python benchmarks/import_time.py [20]
+"""
+
+import subprocess
+import sys
+import time
+
+STATEMENTS = (
+    "pass",
+    "import ceterach",
+    "import ceterach.api",
+    "import ceterach.api; ceterach.api.MediaWiki()",
+    "import ceterach.utils; ceterach.utils.isostrptime('2013-01-01T00:00:00Z')",
+)
+HEAVY = ("requests", "arrow", "concurrent.futures")
+
+REPORT = "import sys; print(' '.join(m for m in {0!r} if m in sys.modules))"
+
+
+def elapsed(statement):
+    before = time.perf_counter()
+    subprocess.check_call([sys.executable, "-c", statement])
+    return time.perf_counter() - before
+
+
+def loaded(statement):
+    report = statement + "; " + REPORT.format(HEAVY)
+    return subprocess.check_output([sys.executable, "-c", report]).decode().strip()
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    # Compile everything first, so that it isn't counted
+    subprocess.check_call([sys.executable, "-m", "compileall", "-q", "ceterach"])
+    # Take turns, so that whatever else the machine is doing affects each
+    # statement about the same
+    best = dict.fromkeys(STATEMENTS, float("inf"))
+    for _ in range(runs):
+        for statement in STATEMENTS:
+            best[statement] = min(best[statement], elapsed(statement))
+    print("{0:8.1f} ms  an empty interpreter".format(best["pass"] * 1e3))
+    for statement in STATEMENTS[1:]:
+        took = best[statement] - best["pass"]
+        print("{0:+8.1f} ms  {1}".format(took * 1e3, statement))
+        print("{0:>11}  imports: {1}".format("", loaded(statement) or "-"))
+
+
+if __name__ == "__main__":
+    main()
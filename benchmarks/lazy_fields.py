@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+"""Compare the memory and attribute access time of Revision objects before
+and after they were given ``__slots__`` and :class:`ceterach.utils.lazy`.
+
+The two versions of the package are taken from git with ``git archive``
+and imported side by side as ``ceterach_before`` and ``ceterach_after``,
+so that nothing else that changed since (like interning Pages and Users)
+is measured along with them. Every Revision is loaded with
+``load_attributes()`` from a record with its own page and user, and the
+memory is given both for the whole load, which includes the Page and User
+objects that it makes, and for the Revision object on its own.
+
+Run it from the root of the repository, optionally with the commits to
+compare: ::
+
+    $ python benchmarks/lazy_fields.py [before after]
+"""
+
+import gc
+import importlib
+import io
+import subprocess
+import sys
+import tarfile
+import tempfile
+import timeit
+import tracemalloc
+
+# The last commit with the __dict__-and-property classes, and the commit
+# that replaced them
+BEFORE = "bac21e1"
+AFTER = "dac5958"
+N = 100000
+
+
+def _package(commit, name, tmp):
+    """Imports the ceterach package from *commit* as *name*, extracting it
+    into *tmp*."""
+    archive = subprocess.check_output(
+        ["git", "archive", "--prefix={0}/".format(name),
+         "{0}:ceterach".format(commit)])
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(tmp)
+    return importlib.import_module(name + ".api")
+
+
+def _res(revid):
+    return {"pageid": revid, "revisions": ({
+        "revid": revid, "parentid": 0, "user": "User {0}".format(revid),
+        "comment": "", "timestamp": "2013-01-01T00:00:00Z", "*": "",
+    },)}
+
+
+def _load(api, revid):
+    r = api.revision(revid)
+    r.load_attributes(_res(revid))
+    return r
+
+
+def _sizeof(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def memory(wiki):
+    api = wiki("http://localhost/w/api.php")
+    gc.collect()
+    tracemalloc.start()
+    objs = [_load(api, revid) for revid in range(1, N + 1)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    alone = sum(_sizeof(r) for r in objs)
+    del objs
+    return size / N, alone / N
+
+
+def access(wiki):
+    obj = _load(wiki("http://localhost/w/api.php"), 1)
+    return min(timeit.repeat(lambda: obj.summary, number=N, repeat=5)) / N
+
+
+def main():
+    before, after = sys.argv[1:3] if len(sys.argv) > 2 else (BEFORE, AFTER)
+    with tempfile.TemporaryDirectory() as tmp:
+        sys.path.insert(0, tmp)
+        for (name, commit, package) in (
+                ("__dict__ + property", before, "ceterach_before"),
+                ("__slots__ + lazy", after, "ceterach_after")):
+            wiki = _package(commit, package, tmp).MediaWiki
+            total, alone = memory(wiki)
+            print("{0:<20} {1:8.1f} bytes/load {2:8.1f} bytes/Revision "
+                  "{3:8.1f} ns/access".format(name, total, alone,
+                                              access(wiki) * 1e9))
+
+
+if __name__ == "__main__":
+    main()
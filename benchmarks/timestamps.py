@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+"""Time how long it takes to hydrate a million revision records, with and
+without reading their timestamps, and how long parsing the timestamps
+takes with Arrow.strptime() and with isostrptime().
+
+Run it from the root of the repository, optionally with the number of
+records: ::
+
+    $ python benchmarks/timestamps.py [1000000]
+"""
+
+import sys
+import time
+
+sys.path.insert(0, ".")
+
+from arrow import Arrow
+
+from ceterach.api import MediaWiki
+from ceterach.utils import isostrptime
+
+FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def records(n):
+    start = 1357000000
+    for i in range(n):
+        stamp = time.strftime(FORMAT, time.gmtime(start + i * 37))
+        yield {"pageid": 1 + i % 1000, "revisions": ({
+            "revid": i + 1, "parentid": i, "user": "User {0}".format(i % 500),
+            "comment": "", "timestamp": stamp,
+        },)}
+
+
+def timed(func, recs):
+    before = time.perf_counter()
+    func(recs)
+    return time.perf_counter() - before
+
+
+def strptime(recs):
+    for res in recs:
+        Arrow.strptime(res["revisions"][0]["timestamp"], FORMAT)
+
+
+def fast(recs):
+    for res in recs:
+        isostrptime(res["revisions"][0]["timestamp"])
+
+
+def hydrate(recs, read=False):
+    api = MediaWiki("http://localhost/w/api.php")
+    for res in recs:
+        rev = api.revision(res["revisions"][0]["revid"])
+        rev.load_attributes(res, content=False)
+        if read:
+            rev.timestamp
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    recs = list(records(n))
+    print("{0} records".format(n))
+    for (name, func) in (("Arrow.strptime()", strptime),
+                         ("isostrptime()", fast),
+                         ("load, timestamp unread", hydrate),
+                         ("load, timestamp read",
+                          lambda recs: hydrate(recs, read=True))):
+        print("{0:<24} {1:8.2f} s".format(name, timed(func, recs)))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,7 +17,30 @@
 # along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
 #-------------------------------------------------------------------------------
 
-from . import api, page, category, file, revision, user, exceptions
+import importlib
+
+# The submodules are only imported once they're used, since between them
+# they import requests and arrow, which take a while. Bots that start up
+# often shouldn't have to wait for what they don't use.
+_submodules = frozenset((
+    "aio", "api", "batch", "cache", "category", "dump", "exceptions", "file",
+    "page", "revision", "shards", "store", "throttle", "transport", "user",
+    "utils",
+))
+# What used to be imported eagerly, which is what a star import gets. The
+# others have optional or slow dependencies, like aiohttp for aio.
+__all__ = ["api", "category", "exceptions", "file", "page", "revision", "user"]
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module("." + name, __name__)
+    err = "module {0!r} has no attribute {1!r}"
+    raise AttributeError(err.format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | _submodules)
 
 __author__ = "Riamse"
 __version__ = "0.0.1"
@@ -0,0 +1,478 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import os
+import asyncio
+import json
+from time import time
+
+import aiohttp
+
+from . import exceptions as exc
+from .api import MediaWiki, USER_AGENT, _merge_query, _no_json
+from .file import File
+from .page import Page
+from .revision import Revision
+from .user import User
+from .utils import chunks
+
+__all__ = ["AsyncMediaWiki"]
+
+
+async def _prefetched(batches, size):
+    """The asynchronous version of :func:`ceterach.utils.prefetched`, which
+    runs *batches* in a separate task."""
+    q = asyncio.Queue(maxsize=size)
+    done = object()
+
+    async def produce():
+        try:
+            async for item in batches:
+                await q.put((item, None))
+        except Exception as e:
+            await q.put((done, e))
+        else:
+            await q.put((done, None))
+
+    task = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item, error = await q.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        task.cancel()
+
+
+class AsyncMediaWiki(MediaWiki):
+    """An asyncio version of :class:`ceterach.api.MediaWiki`, which needs
+    `aiohttp <https://aiohttp.readthedocs.io/>`_.
+
+    The methods that talk to the API are coroutines, and the iterators are
+    asynchronous generators: ::
+
+        >>> async with AsyncMediaWiki("http://en.wikipedia.org/w/api.php") as api:
+        ...     async for p in api.iterator(list="allpages", limit=3):
+        ...         print(p)
+
+    Parameters are built, throttled, and retried after ``maxlag`` errors
+    exactly like they are in MediaWiki, and the objects returned by
+    :meth:`pages`, :meth:`users`, and :meth:`revisions` are the usual Page,
+    User, and Revision objects. Their attributes can't be loaded lazily,
+    though, since that would block the event loop, so load them with those
+    methods before using them.
+    """
+
+    def __init__(self, api_url="http://en.wikipedia.org/w/api.php", config=None):
+        super().__init__(api_url, config)
+        # This can only be made once there's an event loop running
+        self._slots = None
+
+    @staticmethod
+    def _new_opener():
+        # The aiohttp session can only be made once there's an event loop
+        # running, so _request makes it
+        return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the underlying HTTP session."""
+        if self.opener is not None:
+            await self.opener.close()
+            self.opener = None
+
+    async def call(self, params=None, **more_params):
+        """Sends an API query to the wiki. See :meth:`MediaWiki.call`."""
+        if not params:
+            params = {}
+        use_defaults = more_params.pop("use_defaults", True)
+        use_cache = more_params.pop("use_cache", True)
+        return await self._call(params, more_params, use_defaults=use_defaults,
+                                use_cache=use_cache)
+
+    async def _call(self, params, more_params=None, use_defaults=False,
+                    use_cache=True):
+        params = self._build_call_params(params, more_params, use_defaults)
+        is_get = params['action'] in self.config['get']
+        key = self._cache_key(params, is_get) if use_cache else None
+        if key is not None:
+            ret = self.config['cache'].get(key)
+            if ret is not None:
+                return ret
+        limiter = self._limiter(is_get)
+        tries = 0
+        while True:
+            await self._acquire(limiter)
+            try:
+                ret, raiseme, headers = await self._request(params, is_get)
+            finally:
+                await self._release(limiter)
+            if not self._is_lagged(ret):
+                if raiseme is None:
+                    limiter.succeeded()
+                break
+            limiter.lagged(*self._lag(ret, headers))
+            if tries >= self.config['retries']:
+                raiseme = self._too_many_retries()
+                break
+            tries += 1
+        ret = self._result(ret, raiseme)
+        if key is not None:
+            self.config['cache'].set(key, params, ret)
+        return ret
+
+    async def _acquire(self, limiter):
+        # AdaptiveLimiter.acquire would block the event loop
+        await asyncio.sleep(limiter.reserve())
+        if self._slots is None:
+            self._slots = asyncio.Condition()
+        async with self._slots:
+            await self._slots.wait_for(limiter.try_enter)
+
+    async def _release(self, limiter):
+        limiter.release()
+        async with self._slots:
+            self._slots.notify_all()
+
+    async def _request(self, params, is_get):
+        if self.config.get('transport') is not None:
+            # Transports block, so they're given a thread
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, super()._request,
+                                              params, is_get)
+        if self.opener is None:
+            self.opener = aiohttp.ClientSession(headers={"User-Agent": USER_AGENT})
+        # aiohttp is pickier than requests about what it will encode
+        params = {k: str(v) for (k, v) in params.items()}
+        urlopen = self.opener.get if is_get else self.opener.post
+        try:
+            kwargs = {"params" if is_get else "data": params}
+            async with urlopen(self.api_url, **kwargs) as res:
+                text = await res.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.last_query = time()
+            return {}, exc.ApiError(e), {}
+        self.last_query = time()
+        try:
+            return json.loads(text), None, res.headers
+        except ValueError:
+            return _no_json(), None, res.headers
+
+    async def login(self, username, password):
+        """Try to log in with the given username and password.
+
+        :returns: True if the login succeeded, False if not.
+        """
+        self._new_session()
+        params = {"action": "login", "lgname": username, "lgpassword": password}
+        result = await self.call(params, use_defaults=False)
+        if result['login']['result'] == "Success":
+            return True
+        elif result['login']['result'] == "NeedToken":
+            params['lgtoken'] = result['login']['token']
+            result = await self.call(params, use_defaults=False)
+            if result['login']['result'] == "Success":
+                return True
+        return False
+
+    async def logout(self):
+        """Log the bot out.
+
+        :returns: True
+        """
+        self._new_session()
+        return len(await self.call(action="logout", use_defaults=False)) == 0
+
+    async def set_token(self, *args):
+        """Sets the Wiki's ``tokens`` attribute with the tokens specified in
+        the *args*. See :meth:`MediaWiki.set_token`.
+        """
+        res = await self.call(self._token_query(args))
+        self._store_tokens(res)
+
+    async def expand_templates(self, title, text, include_comments=False):
+        """Evaluate the templates in *text* and return the processed result.
+        See :meth:`MediaWiki.expand_templates`."""
+        params = {"action": "expandtemplates", "title": title, "text": text}
+        if include_comments:
+            params['includecomments'] = True
+        res = await self.call(params, use_defaults=False)
+        return res['expandtemplates']["*"]
+
+    @property
+    def namespaces(self):
+        """An awaitable of a mapping of the namespace number to the
+        namespace name: ::
+
+            >>> namespaces = await api.namespaces
+        """
+        return self._get_namespaces()
+
+    async def _get_namespaces(self):
+        if self._namespaces is None:
+            namespaces = {}
+            async for ns in self.iterator(use_defaults=False,
+                                          meta="siteinfo", siprop="namespaces"):
+                namespaces[ns['id']] = ns["*"]
+            self._namespaces = namespaces
+        return self._namespaces
+
+    def olditerator(self, params=None, limit=float("inf"), prefetch=0,
+                    continuation=None, checkpoint=None, **more_params):
+        """An asynchronous generator that iterates over an API query. See
+        :meth:`MediaWiki.olditerator`."""
+        return self._iterate(params, limit, more_params, True, prefetch,
+                             continuation, checkpoint)
+
+    def newiterator(self, params=None, limit=float("inf"), prefetch=0,
+                    continuation=None, checkpoint=None, merge=False,
+                    **more_params):
+        """An asynchronous generator that iterates over an API query. See
+        :meth:`MediaWiki.newiterator`."""
+        return self._iterate(params, limit, more_params, False, prefetch,
+                             continuation, checkpoint, merge)
+
+    iterator = olditerator
+
+    async def _iterate(self, params, limit, more_params, raw, prefetch=0,
+                       continuation=None, checkpoint=None, merge=False):
+        params = dict(params or {})
+        if raw:
+            more_params = dict(more_params, rawcontinue='')
+        state = self._resume(continuation, checkpoint)
+        if state.get("done"):
+            return
+        skip = state["offset"]
+        batches = self._batches(params, more_params, raw, state["continue"],
+                                merge)
+        if prefetch:
+            batches = _prefetched(batches, prefetch)
+        l = 0
+        try:
+            async for (cont, items) in batches:
+                if cont is not state["continue"]:
+                    state.update({"continue": cont, "offset": skip})
+                    self._save(state, checkpoint)
+                for r in items:
+                    if skip:
+                        skip -= 1
+                        continue
+                    yield r
+                    state["offset"] += 1
+                    l += 1
+                    if l >= limit:
+                        return
+            state["done"] = True
+            if checkpoint is not None and os.path.exists(checkpoint):
+                os.remove(checkpoint)
+        finally:
+            await batches.aclose()
+            if not state.get("done"):
+                self._save(state, checkpoint)
+
+    async def _batches(self, params, more_params, raw, cont=None,
+                       merge=False):
+        cont = dict(cont or {})
+        base = dict(params)
+        params.update(cont)
+        group, pages = cont, {}
+        while True:
+            res = await self.call(params, **more_params)
+            if merge:
+                items, complete = self._merge_batch(res, pages)
+            else:
+                items, complete = self._query_items(res), True
+                if items is None:
+                    return
+            yield group, items
+            c = self._continuation(res, raw)
+            if c is None:
+                return
+            if raw:
+                params.update(c)
+                cont = dict(cont, **c)
+            else:
+                params, cont = dict(base, **c), c
+            if complete:
+                group = cont
+
+    async def sharded_iterator(self, shards, params=None, workers=4,
+                               ordered=False, key=None, limit=float("inf"),
+                               **more_params):
+        """An asynchronous generator that iterates over an API query that is
+        split into independent *shards*, listing up to *workers* of them at
+        once in separate tasks. See :meth:`MediaWiki.sharded_iterator`."""
+        shards = [dict(params or {}, **shard) for shard in shards]
+        more_params = dict(more_params, rawcontinue='')
+        if ordered:
+            queues = [asyncio.Queue(maxsize=2) for _ in shards]
+        else:
+            queues = [asyncio.Queue(maxsize=2 * workers)] * len(shards)
+        slots = asyncio.Semaphore(workers)
+        done = object()
+
+        async def run(i):
+            q = queues[i]
+            try:
+                async with slots:
+                    async for (_, items) in self._batches(shards[i],
+                                                          more_params, True):
+                        await q.put((i, items, None))
+            except Exception as e:
+                await q.put((i, done, e))
+            else:
+                await q.put((i, done, None))
+
+        tasks = [asyncio.ensure_future(run(i)) for i in range(len(shards))]
+        join = self._shard_joiner(done, key)
+        finished = l = 0
+        try:
+            while finished < len(shards):
+                # In order, each shard's queue is emptied before the next's
+                i, items, error = await queues[finished if ordered else 0].get()
+                if error is not None:
+                    raise error
+                if items is done:
+                    finished += 1
+                for item in join(i, items):
+                    yield item
+                    l += 1
+                    if l >= limit:
+                        return
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def pages(self, identities, follow_redirects=False, fields=None):
+        """An asynchronous generator of loaded Pages. See
+        :meth:`MediaWiki.pages`."""
+        for chunk in chunks(identities, await self._get_chunk_size()):
+            pages = [p if isinstance(p, Page)
+                     else self.page(p, follow_redirects, fields)
+                     for p in chunk]
+            await self._load_pages(pages)
+            for p in pages:
+                yield p
+
+    async def iter_pages(self, generator, fields=None, **gparams):
+        """An asynchronous generator of loaded Pages. See
+        :meth:`MediaWiki.iter_pages`."""
+        params = self._generator_params(File(self, "File:-", fields=fields),
+                                        generator, gparams)
+        async for res in self.newiterator(params, merge=True,
+                                          use_defaults=False):
+            p = self._page_from(res, fields)
+            if p is not None:
+                yield p
+
+    async def iter_revisions(self, generator, fields=None, **gparams):
+        """An asynchronous generator of loaded Revisions. See
+        :meth:`MediaWiki.iter_revisions`."""
+        params = self._generator_params(Revision(self, 0, fields),
+                                        generator, gparams)
+        async for res in self.newiterator(params, merge=True,
+                                          use_defaults=False):
+            for rev in self._revisions_from(res, fields):
+                yield rev
+
+    async def iter_users(self, module, **lparams):
+        """An asynchronous generator of loaded Users. See
+        :meth:`MediaWiki.iter_users`."""
+        names = []
+        async for r in self.newiterator(list=module, use_defaults=False,
+                                        **lparams):
+            names.append(r.get('name', r.get('user')))
+            if len(names) == await self._get_chunk_size():
+                async for u in self.users(names):
+                    yield u
+                names = []
+        if names:
+            async for u in self.users(names):
+                yield u
+
+    async def users(self, names):
+        """An asynchronous generator of loaded Users. See
+        :meth:`MediaWiki.users`."""
+        for chunk in chunks(names, await self._get_chunk_size()):
+            users = [u if isinstance(u, User) else self.user(u) for u in chunk]
+            res = await self.call(self._user_query(users), use_defaults=False)
+            self._hydrate_users(users, res)
+            for u in users:
+                yield u
+
+    async def revisions(self, revids, content=False, fields=None):
+        """An asynchronous generator of loaded Revisions. See
+        :meth:`MediaWiki.revisions`."""
+        for chunk in chunks(revids, await self._get_chunk_size()):
+            revs = [r if isinstance(r, Revision) else self.revision(r, fields)
+                    for r in chunk]
+            params = self._revision_query(revs, content)
+            stored = content and self._use_store(params, params['revids'])
+            query = await self._query_pages(params)
+            if stored:
+                await self._fill_content(r for page in query.get("pages", {}).values()
+                                         for r in page.get("revisions", ()))
+            self._hydrate_revisions(revs, query, content)
+            for r in revs:
+                yield r
+
+    async def _load_pages(self, pages, follow=True):
+        redirects = []
+        for (group, params) in self._page_queries(pages):
+            stored = self._use_store(params)
+            query = await self._query_pages(params)
+            if stored:
+                await self._fill_content(r for page in query.get("pages", {}).values()
+                                         for r in page.get("revisions", ()))
+            redirects += self._hydrate_pages(group, query, follow)
+        if redirects:
+            await self._load_pages(self._retarget(redirects), follow=False)
+
+    async def _fill_content(self, revisions):
+        revisions, found, missing = self._stored_content(revisions)
+        if missing:
+            for chunk in chunks(missing, await self._get_chunk_size()):
+                query = await self._query_pages(self._content_query(chunk))
+                found.update(self._fetched_content(query))
+        self._put_content(revisions, found)
+
+    async def _query_pages(self, params):
+        base, query = params, {}
+        while True:
+            res = await self.call(params, use_defaults=False)
+            _merge_query(query, res.get('query', {}))
+            c = self._continuation(res, raw='continue' not in res)
+            if c is None:
+                return query
+            params = dict(base, **c)
+
+    async def _get_chunk_size(self):
+        if self._chunk is None:
+            res = await self.call(meta="userinfo", uiprop="rights",
+                                  use_defaults=False)
+            self._chunk = self._chunk_from(res)
+        return self._chunk
@@ -17,23 +17,31 @@
 # along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
 # -----------------------------------------------------------------------------
 
-import itertools
+import os
+import sys
+import re
+import json
+import queue
 import collections
-from time import time, sleep
+import contextlib
+import threading
+import weakref
+from time import time
 from urllib.parse import urlparse
-from platform import python_version as pyv
 from copy import deepcopy
 
-import requests
-
 # from . import __version__ as cv
 cv = '0.0.1'
 from . import exceptions as exc
+from .batch import Batch
 from .category import Category
 from .file import File
 from .page import Page
 from .user import User
 from .revision import Revision
+from .throttle import AdaptiveLimiter
+from .transport import RequestsTransport
+from .utils import chunks, check_fields, normalize, offer, prefetched
 
 # stackoverflow.com/questions/3217492/list-of-language-codes-in-yaml-or-json
 
@@ -41,8 +49,13 @@ __all__ = ["MediaWiki"]
 
 # USER_AGENT = "Mozilla/5.0 (Windows NT 6.1; WOW64; rv:14.0) Gecko/20100101 Firefox/14.0.1"
 USER_AGENT = "Ceterach/%s (Python %s; mailto:riamse@protonmail.com)"
-USER_AGENT %= cv, pyv()
+USER_AGENT %= cv, "{0}.{1}.{2}".format(*sys.version_info)
 def_config = {"throttle": 0,
+              "rates": {"read": None, "write": None},
+              "concurrency": {"read": None, "write": None},
+              "cache": None,
+              "store": None,
+              "transport": None,
               "retries": 1,
               "sleep": 5,
               "get": ('query', 'purge'),
@@ -50,6 +63,28 @@ def_config = {"throttle": 0,
 }
 
 
+def _merge_query(query, new):
+    """Merges the ``query`` node *new* into *query*, where *new* is the
+    continuation of *query*.
+    """
+    for (key, value) in new.items():
+        if key != "pages":
+            query.setdefault(key, value)
+            continue
+        pages = query.setdefault("pages", {})
+        for (pageid, page) in value.items():
+            merged = pages.setdefault(pageid, {})
+            for (k, v) in page.items():
+                if isinstance(v, list) and k in merged:
+                    merged[k].extend(v)
+                else:
+                    merged.setdefault(k, v)
+
+
+def _no_json():
+    return {"error": {"code": "py", "info": "No JSON object could be decoded"}}
+
+
 class MediaWiki:
     def __init__(self, api_url="http://en.wikipedia.org/w/api.php", config=None):
 #    def __init__(self, api_url="http://wiki.ciit.zp.ua/api.php", config=None): # 1.16
@@ -63,12 +98,41 @@ class MediaWiki:
 
         - *throttle*, the number of seconds to wait in between
           requests (default: ``0``).
+        - *rates*, a dict with the keys ``"read"`` and ``"write"``, which
+          limit the rate of requests that can be sent with GET and POST
+          respectively. Each value is either a tuple of
+          ``(requests_per_second, burst)``, where *burst* is how many
+          requests can be sent at once after a quiet spell, or None to
+          use *throttle* instead (default: ``{"read": None, "write":
+          None}``). Reads and writes are limited separately, so reading as
+          fast as allowed doesn't use up the budget for writing, unless
+          both are None: then *throttle* is shared between them, so that
+          there is one request every *throttle* seconds either way.
+        - *concurrency*, a dict with the keys ``"read"`` and ``"write"``,
+          which limit how many of those requests can be in flight at once
+          when the object is shared between threads or tasks. None means no
+          limit (default: ``{"read": None, "write": None}``).
         - *retries*, how many times to retry after an error (default: ``1``).
           You can use ``float("inf")`` to keep retrying until it works.
         - *sleep*, the number of seconds to sleep between each retry after an
-          error (default: ``5``).
+          error, if the wiki doesn't send a Retry-After header
+          (default: ``5``).
         - *get*, a tuple of which modules can accept GET requests, which
           can vary from wiki to wiki (default: ``("query", "purge")``).
+        - *cache*, a :class:`ceterach.cache.ResponseCache` that remembers
+          the results of GET requests, or None to not cache anything
+          (default: ``None``). Tokens and purges are never cached, and
+          the cache is emptied when logging in or out.
+        - *store*, a :class:`ceterach.store.ContentStore` that keeps the
+          content of every revision that is downloaded, so that it doesn't
+          have to be downloaded again, or None to always download content
+          (default: ``None``).
+        - *transport*, a :class:`ceterach.transport.Transport` that sends
+          the queries, or None to send them over the network with
+          a ``requests.Session`` (default: ``None``). A
+          :class:`~ceterach.transport.Recording` and a
+          :class:`~ceterach.transport.Replay` can be used to run a bot
+          again without the network.
         - *defaults*, a dict that comprises additional parameters to be sent
           with each request. These can be overwritten on an individual basis
           by explicitly specifying the parameter in ``MediaWiki.call``
@@ -89,15 +153,31 @@ class MediaWiki:
         you wish to modify. Passing ``{"throttle": 3.14}``, for example, will
         result in a dictionary with the above parameters, except the throttle
         will be 3.14.
+
+        A MediaWiki object can be shared between threads.
+
+        The *rates* and *concurrency* are only ceilings: when the wiki
+        replies with a ``maxlag`` error, both are cut and then gradually
+        raised again, so that the object sends requests as fast as the
+        wiki's replicas can keep up with. See :attr:`limiters`.
         """
         self._tokens = {}
         self._namespaces = None
+        self._chunk = None
+        self._lock = threading.RLock()
+        # The Pages and Users that are still in use, so that asking for one
+        # again gives the same object instead of one that loads it again
+        self._interned = weakref.WeakValueDictionary()
+        # Batches are per-thread, so that threads don't load each other's
+        # objects
+        self._local = threading.local()
+        self._limiters = {"read": AdaptiveLimiter(), "write": AdaptiveLimiter(),
+                          "throttle": AdaptiveLimiter()}
         self.api_url = api_url
         self.config = deepcopy(def_config)
         self.config.update(config or {})
         self.last_query = time()
-        self.opener = requests.Session()
-        self.opener.headers.update({"User-Agent": USER_AGENT})
+        self.opener = self._new_opener()
 
     def __repr__(self):
         cls_name = type(self).__name__
@@ -110,109 +190,680 @@ class MediaWiki:
     def __ne__(self, other):
         return getattr(other, 'api_url', None) != self.api_url
 
-    def category(self, identity, follow_redirects=False) -> Category:
+    def category(self, identity, follow_redirects=False, fields=None) -> Category:
         """Returns a Category object for *identity*, which represents either a
         title or pageid.
 
         This method does not follow redirects, or check if the title is
         invalid. Those checks will be done when the Category's attributes are
         loaded.
+
+        *fields* works like it does in :meth:`page`.
         """
-        params = {
-            "follow_redirects": follow_redirects,
-            'pageid' if isinstance(identity, int) else 'title': identity
-        }
-        return Category(self, **params)
+        return self._intern_page(Category, identity, follow_redirects, fields)
 
-    def file(self, identity, follow_redirects=False) -> File:
+    def file(self, identity, follow_redirects=False, fields=None) -> File:
         """Returns a File object for *identity*, which represents either a
         title or pageid.
 
         This method does not follow redirects, or check if the title is
         invalid. Those checks will be done when the Category's attributes are
         loaded.
+
+        *fields* works like it does in :meth:`page`.
         """
-        params = {
-            "follow_redirects": follow_redirects,
-            'pageid' if isinstance(identity, int) else 'title': identity
-        }
-        return File(self, **params)
+        return self._intern_page(File, identity, follow_redirects, fields)
 
-    def page(self, identity, follow_redirects=False) -> Page:
+    def page(self, identity, follow_redirects=False, fields=None) -> Page:
         """Returns a Page object for *identity*, which represents either a
         title or pageid.
 
         This method does not follow redirects, or check if the title is
         invalid. Those will be done when the Page's attributes are loaded.
+
+        *fields* is an iterable of the names of the Page's properties that
+        should be loaded the first time the Page is loaded, or None to load
+        all of them. Anything else is loaded in full when it is first needed.
+        Leaving out ``"content"``, for example, means that checking
+        :attr:`Page.exists` doesn't download the wikitext.
+
+        As long as the Page that this returns is in use, asking for the same
+        title (give or take underscores) or pageid with the same
+        *follow_redirects* returns that Page again, so it is only loaded
+        once. If *fields* is given then, and the Page hasn't been loaded
+        yet, its first load covers those fields too.
         """
-        params = {
-            "follow_redirects": follow_redirects,
-            'pageid' if isinstance(identity, int) else 'title': identity
-        }
-        return Page(self, **params)
+        return self._intern_page(Page, identity, follow_redirects, fields)
 
     def user(self, identity) -> User:
         """
         Returns a User object for *identity*, which represents the username.
+
+        Like :meth:`page`, this returns the same User for the same username
+        for as long as that User is in use.
         """
-        return User(self, identity)
+        key = (User, normalize(identity, first_letter=False))
+        with self._lock:
+            user = self._interned.get(key)
+            if user is None:
+                user = self._interned[key] = self._track(User(self, identity))
+        return user
 
-    def revision(self, identity) -> Revision:
+    def revision(self, identity, fields=None) -> Revision:
         """Returns a Revision object for *identity*, which represents the revid.
 
         This method does not check if the revid is valid. That will be done
         when the Revision's attributes are loaded.
+
+        *fields* works like it does in :meth:`page`.
+        """
+        return self._track(Revision(self, identity, fields))
+
+    def _intern_page(self, cls, identity, follow_redirects, fields):
+        """Returns the *cls* that :meth:`page` would."""
+        if isinstance(identity, int):
+            key, params = identity, {"pageid": identity}
+        else:
+            # Not every wiki capitalises the first letter, so "foo" and "Foo"
+            # may well be different pages
+            key = normalize(identity, first_letter=False)
+            params = {"title": identity}
+        key = (cls, key, follow_redirects)
+        with self._lock:
+            page = self._interned.get(key)
+            if page is None:
+                page = cls(self, fields=fields,
+                           follow_redirects=follow_redirects, **params)
+                self._interned[key] = self._track(page)
+                return page
+            fields = check_fields(page, fields)
+            if page._fields is not None:
+                # It hasn't been loaded yet, so load what everyone asked for
+                page._fields = None if fields is None else page._fields | fields
+        return page
+
+    @property
+    def _batch(self):
+        return getattr(self._local, "batch", None)
+
+    @_batch.setter
+    def _batch(self, batch):
+        self._local.batch = batch
+
+    def _track(self, obj):
+        if self._batch is not None:
+            self._batch.add(obj)
+        return obj
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Returns a context manager, inside of which the Pages, Users, and
+        Revisions created by this object are loaded together.
+
+        Normally, each object makes its own query the first time one of its
+        attributes is needed. Inside the context manager, the first object
+        that needs to be loaded takes every other object of the same kind
+        that hasn't been loaded yet along with it, using :meth:`pages`,
+        :meth:`users`, or :meth:`revisions`. For example, this makes a few
+        queries instead of one per revision: ::
+
+            >>> with api.batch():
+            ...     for r in page.revisions:
+            ...         print(r.user.editcount)
+
+        Objects are only collected while the context manager is active, and
+        nesting it has no extra effect.
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+        self._batch = Batch(self)
+        try:
+            yield self._batch
+        finally:
+            self._batch = None
+
+    def pages(self, identities, follow_redirects=False, fields=None):
+        """Returns a generator of Page objects for *identities*, an iterable
+        whose items are titles, pageids, or Page objects, in the same order.
+
+        Unlike :meth:`page`, the Pages are loaded before they are yielded,
+        with one query per 50 identities (500 if the logged in user has the
+        ``apihighlimits`` right) instead of one query per Page. Titles are
+        normalised, and Pages which are passed in are loaded in place.
+        Missing pages are loaded like any other, and invalid ones are left
+        for :meth:`Page.load_attributes` to complain about.
+
+        :type identities: iterable
+        :param identities: Titles, pageids, or Page objects.
+        :type follow_redirects: bool
+        :param follow_redirects: Passed to the constructor of Pages that are
+                                 created from titles or pageids.
+        :type fields: iterable
+        :param fields: Passed to the constructor of Pages that are created
+                       from titles or pageids. See :meth:`page`.
+        :returns: A generator of Pages.
+        """
+        for chunk in chunks(identities, self._chunk_size):
+            pages = [p if isinstance(p, Page)
+                     else self.page(p, follow_redirects, fields)
+                     for p in chunk]
+            self._load_pages(pages)
+            for p in pages:
+                yield p
+
+    def iter_pages(self, generator, fields=None, **gparams):
+        """Iterates over the pages that the ``generator=`` module *generator*
+        lists, as loaded Pages. Pages in the Category and File namespaces
+        are yielded as Categories and Files.
+
+        Everything that :meth:`Page.load_attributes` (and
+        :meth:`File.load_attributes`) would load comes with the listing,
+        so using the Pages doesn't need any more queries. The prop data of
+        each page is collected from as many responses as it takes, like
+        ``newiterator(merge=True)`` does.
+
+        :type generator: str
+        :param generator: The name of the generator, e.g. ``"allpages"``.
+        :type fields: iterable
+        :param fields: Passed to the constructor of the Pages, to load less
+                       of them. See :meth:`page`.
+        :param gparams: Parameters to the query, such as the generator's
+                        own, e.g. ``gapnamespace=0``.
+        :returns: A generator of Pages, Categories and Files.
+        """
+        params = self._generator_params(File(self, "File:-", fields=fields),
+                                        generator, gparams)
+        for res in self.newiterator(params, merge=True, use_defaults=False):
+            p = self._page_from(res, fields)
+            if p is not None:
+                yield p
+
+    def iter_revisions(self, generator, fields=None, **gparams):
+        """Iterates over the current revisions of the pages that the
+        ``generator=`` module *generator* lists, as loaded Revisions.
+
+        Following up on the Revisions doesn't need any more queries, unless
+        *fields* leaves something out. See :meth:`iter_pages`.
+
+        :returns: A generator of Revisions.
+        """
+        params = self._generator_params(Revision(self, 0, fields),
+                                        generator, gparams)
+        for res in self.newiterator(params, merge=True, use_defaults=False):
+            for rev in self._revisions_from(res, fields):
+                yield rev
+
+    def iter_users(self, module, **lparams):
+        """Iterates over the users that the ``list=`` module *module* lists,
+        e.g. ``"allusers"`` or ``"blocks"``, as loaded Users.
+
+        No list has everything that :meth:`User.load_attributes` loads, so
+        the Users are loaded like :meth:`users` loads them, with one more
+        query per 50 users (500 with ``apihighlimits``).
+
+        :param lparams: Parameters to the query, such as the module's own.
+        :returns: A generator of Users.
+        """
+        items = self.newiterator(list=module, use_defaults=False, **lparams)
+        return self.users(r.get('name', r.get('user')) for r in items)
+
+    def users(self, names):
+        """Returns a generator of User objects for *names*, an iterable whose
+        items are usernames or User objects, in the same order.
+
+        The Users are loaded before they are yielded, with one query per 50
+        names (500 if the logged in user has the ``apihighlimits`` right)
+        instead of one query per User. Users which are passed in are loaded
+        in place.
+
+        :type names: iterable
+        :param names: Usernames or User objects.
+        :returns: A generator of Users.
+        """
+        for chunk in chunks(names, self._chunk_size):
+            users = [u if isinstance(u, User) else self.user(u) for u in chunk]
+            res = self.call(self._user_query(users), use_defaults=False)
+            self._hydrate_users(users, res)
+            for u in users:
+                yield u
+
+    def revisions(self, revids, content=False, fields=None):
+        """Returns a generator of Revision objects for *revids*, an iterable
+        whose items are revids or Revision objects, in the same order.
+
+        The Revisions are loaded before they are yielded, with one query per
+        50 revids (500 if the logged in user has the ``apihighlimits`` right)
+        instead of one query per Revision. Revisions which are passed in are
+        loaded in place.
+
+        :type revids: iterable
+        :param revids: Revids or Revision objects.
+        :type content: bool
+        :param content: Whether to download the content of the revisions as
+                        well. If False, the content will be loaded when it is
+                        first needed.
+        :type fields: iterable
+        :param fields: Passed to the constructor of Revisions that are
+                       created from revids. See :meth:`page`.
+        :returns: A generator of Revisions.
+        """
+        for chunk in chunks(revids, self._chunk_size):
+            revs = [r if isinstance(r, Revision) else self.revision(r, fields)
+                    for r in chunk]
+            params = self._revision_query(revs, content)
+            stored = content and self._use_store(params, params['revids'])
+            query = self._query_pages(params)
+            if stored:
+                self._fill_content(r for page in query.get("pages", {}).values()
+                                   for r in page.get("revisions", ()))
+            self._hydrate_revisions(revs, query, content)
+            for r in revs:
+                yield r
+
+    # The bulk loaders are split into the parts that talk to the API, and
+    # the parts that don't, which are shared with AsyncMediaWiki.
+
+    def _load_pages(self, pages, follow=True):
+        redirects = []
+        for (group, params) in self._page_queries(pages):
+            stored = self._use_store(params)
+            query = self._query_pages(params)
+            if stored:
+                self._fill_content(r for page in query.get("pages", {}).values()
+                                   for r in page.get("revisions", ()))
+            redirects += self._hydrate_pages(group, query, follow)
+        if redirects:
+            self._load_pages(self._retarget(redirects), follow=False)
+
+    @staticmethod
+    def _page_queries(pages):
+        """Yields ``(pages, params)`` for each query needed to load *pages*.
+        """
+        # titles= and pageids= cannot be used in the same query
+        by_title = [p for p in pages if p.title]
+        by_pageid = [p for p in pages if not p.title]
+        for key, group in (("titles", by_title), ("pageids", by_pageid)):
+            if not group:
+                continue
+            params = MediaWiki._union_params(group)
+            idents = (p.title if key == "titles" else p.pageid for p in group)
+            params[key] = list(collections.OrderedDict.fromkeys(idents))
+            yield group, params
+
+    @staticmethod
+    def _generator_params(proto, generator, gparams):
+        """Returns the parameters for loading what *generator* lists like
+        *proto*, an object of the kind to yield, would load itself."""
+        params = proto._load_params()
+        params.update(gparams, generator=generator)
+        return params
+
+    def _page_from(self, res, fields=None):
+        """Returns the Page, Category or File that *res* is about, loaded
+        with *fields* from it, or None if its title is invalid."""
+        factory = {14: self.category, 6: self.file}.get(res.get('ns'),
+                                                        self.page)
+        p = factory(res['title'], fields=fields)
+        # A Page that was already in use may be waiting for more than res has
+        p._fields = check_fields(p, fields)
+        try:
+            p.load_attributes(res)
+        except exc.InvalidPageError:
+            return None
+        return p
+
+    def _revisions_from(self, res, fields=None):
+        """Returns the Revisions in the page *res*, loaded with *fields*
+        from it."""
+        revs = []
+        for r in res.get("revisions", ()):
+            rev = self.revision(r['revid'], fields)
+            rev.load_attributes({"pageid": res['pageid'], "revisions": (r,)})
+            revs.append(rev)
+        return revs
+
+    @staticmethod
+    def _union_params(objs):
+        """Returns the query parameters that load every one of *objs*."""
+        params = {}
+        for obj in objs:
+            for (k, v) in obj._load_params().items():
+                values = params.setdefault(k, [])
+                for value in (v,) if isinstance(v, str) else v:
+                    if value not in values:
+                        values.append(value)
+        return params
+
+    @staticmethod
+    def _hydrate_pages(pages, query, follow):
+        normalized = {n['from']: n['to'] for n in query.get("normalized", ())}
+        titles, pageids = {}, {}
+        for res in query.get("pages", {}).values():
+            if 'title' in res:
+                titles[res['title']] = res
+            if 'pageid' in res:
+                pageids[res['pageid']] = res
+        redirects = []
+        for p in pages:
+            if p.title:
+                res = titles.get(normalized.get(p.title, p.title))
+            else:
+                res = pageids.get(p.pageid)
+            if res is None:
+                continue
+            if 'title' not in res:
+                # A pageid that doesn't exist, so there's nothing to load
+                p._exists = False
+                continue
+            # Redirects are resolved together afterwards
+            follow_redirects, p.follow_redirects = p.follow_redirects, False
+            try:
+                p.load_attributes(res)
+            except exc.InvalidPageError:
+                continue
+            finally:
+                p.follow_redirects = follow_redirects
+            if follow and follow_redirects and p.is_redirect:
+                redirects.append(p)
+        return redirects
+
+    @staticmethod
+    def _retarget(redirects):
+        # This is what Page.load_attributes does, minus the extra queries
+        for p in redirects:
+            p._title = p.get_redirect_target().title
+            del p._content
+        return redirects
+
+    @staticmethod
+    def _user_query(users):
+        params = users[0]._load_params()
+        unique = collections.OrderedDict.fromkeys(u.name for u in users)
+        params['ususers'] = list(unique)
+        return params
+
+    @staticmethod
+    def _hydrate_users(users, res):
+        found = {}
+        for r in res['query']['users']:
+            found[r['name']] = r
+            found.setdefault(normalize(r['name']), r)
+        for u in users:
+            r = found.get(u.name) or found.get(normalize(u.name))
+            if r is not None:
+                u.load_attributes(r)
+
+    @staticmethod
+    def _revision_query(revs, content):
+        params = MediaWiki._union_params(revs)
+        if not content:
+            params['rvprop'] = [p for p in params['rvprop'] if p != 'content']
+        unique = collections.OrderedDict.fromkeys(r.revid for r in revs)
+        params['revids'] = list(unique)
+        return params
+
+    @staticmethod
+    def _hydrate_revisions(revs, query, content):
+        found = {}
+        for page in query.get("pages", {}).values():
+            for r in page.get("revisions", ()):
+                found[r['revid']] = {"pageid": page['pageid'],
+                                     "revisions": (r,)}
+        for r in revs:
+            res = found.get(r.revid)
+            if res is not None:
+                r.load_attributes(res, content=content)
+
+    def _query_pages(self, params):
+        """Sends a query that isn't using a generator, and keeps following
+        the continuation until the data for every page is complete.
+
+        :returns: The merged ``query`` node of the results.
+        """
+        base, query = params, {}
+        while True:
+            res = self.call(params, use_defaults=False)
+            _merge_query(query, res.get('query', {}))
+            c = self._continuation(res, raw='continue' not in res)
+            if c is None:
+                return query
+            # A prop that is finished isn't in c, and mustn't be continued
+            params = dict(base, **c)
+
+    def _use_store(self, params, revids=None):
+        """If there's a content store, takes ``content`` out of the
+        ``rvprop`` of *params*, so that :meth:`_fill_content` can fill it in
+        from the store afterwards. If *revids* are given, the content is
+        only taken out if all of them are stored, since otherwise it would
+        have to be downloaded anyway.
+
+        :returns: Whether :meth:`_fill_content` should be called on the
+                  revisions in the result.
+        """
+        store = self.config.get('store')
+        if store is None:
+            return False
+        rvprop = params.get('rvprop', ())
+        if isinstance(rvprop, str):
+            rvprop = rvprop.split("|")
+        if "content" not in rvprop:
+            return False
+        if revids is None or len(store.get_many(revids)) == len(revids):
+            params['rvprop'] = [p for p in rvprop if p != "content"]
+        return True
+
+    def _fill_content(self, revisions):
+        """Fills in the content of *revisions*, which are revision dicts
+        from a result that was requested without ``rvprop=content``, e.g.
+        because it went through :meth:`_use_store`.
+
+        If there's a content store, content that the result already has is
+        saved in it, and the rest is taken from it if possible. Whatever is
+        left is downloaded by revid, as few revisions at a time as the
+        wiki allows.
+        """
+        revisions, found, missing = self._stored_content(revisions)
+        for chunk in chunks(missing, self._chunk_size if missing else 1):
+            query = self._query_pages(self._content_query(chunk))
+            found.update(self._fetched_content(query))
+        self._put_content(revisions, found)
+
+    # The parts of _fill_content that don't talk to the API, which are
+    # shared with AsyncMediaWiki.
+
+    def _stored_content(self, revisions):
+        """Returns ``(revisions, found, missing)``: the revision dicts in
+        *revisions* that have revids, a dict of the content that is already
+        known by revid, and the revids whose content has to be downloaded.
         """
-        return Revision(self, identity)
-
-    def _call(self, params, more_params=None, use_defaults=False):
-        time_since_last_query = time() - self.last_query
-        conf = self.config
-        throttle = conf['throttle']
-        if throttle and time_since_last_query < throttle:
-            sleep(throttle - time_since_last_query)
+        store = self.config.get('store')
+        revisions = [r for r in revisions if 'revid' in r]
+        want = [r['revid'] for r in revisions if '*' not in r]
+        if store is not None:
+            store.put_many((r['revid'], r['*']) for r in revisions if '*' in r)
+            found = store.get_many(want)
+        else:
+            found = {}
+        return revisions, found, [revid for revid in want if revid not in found]
+
+    @staticmethod
+    def _content_query(revids):
+        return {"prop": "revisions", "rvprop": ("ids", "content"),
+                "revids": revids}
+
+    def _fetched_content(self, query):
+        """Saves the content in *query* in the store, and returns it as a
+        dict by revid."""
+        fetched = {r['revid']: r['*']
+                   for page in query.get("pages", {}).values()
+                   for r in page.get("revisions", ()) if '*' in r}
+        store = self.config.get('store')
+        if store is not None:
+            store.put_many(fetched.items())
+        return fetched
+
+    @staticmethod
+    def _put_content(revisions, found):
+        for r in revisions:
+            # Revisions whose content is hidden stay without it
+            if r['revid'] in found:
+                r['*'] = found[r['revid']]
+
+    @property
+    def _chunk_size(self):
+        """How many titles, pageids, revids, or usernames can be sent in one
+        query."""
+        if self._chunk is None:
+            res = self.call(meta="userinfo", uiprop="rights",
+                            use_defaults=False)
+            self._chunk = self._chunk_from(res)
+        return self._chunk
+
+    @staticmethod
+    def _chunk_from(res):
+        rights = res['query']['userinfo'].get("rights", ())
+        return 500 if "apihighlimits" in rights else 50
+
+    def _call(self, params, more_params=None, use_defaults=False,
+              use_cache=True):
         params = self._build_call_params(params, more_params, use_defaults)
-        is_get = params['action'] in conf['get']
-        raiseme = None
-        urlopen = getattr(self.opener, 'get' if is_get else 'post')
+        is_get = params['action'] in self.config['get']
+        key = self._cache_key(params, is_get) if use_cache else None
+        if key is not None:
+            ret = self.config['cache'].get(key)
+            if ret is not None:
+                return ret
+        limiter = self._limiter(is_get)
+        tries = 0
+        while True:
+            limiter.acquire()
+            try:
+                ret, raiseme, headers = self._request(params, is_get)
+            finally:
+                limiter.release()
+            if not self._is_lagged(ret):
+                if raiseme is None:
+                    limiter.succeeded()
+                break
+            limiter.lagged(*self._lag(ret, headers))
+            if tries >= self.config['retries']:
+                raiseme = self._too_many_retries()
+                break
+            tries += 1
+        ret = self._result(ret, raiseme)
+        if key is not None:
+            self.config['cache'].set(key, params, ret)
+        return ret
+
+    def _request(self, params, is_get):
+        """Sends *params* to the API with the configured transport.
+
+        :returns: ``(result, exception, headers)``, where *exception* is an
+                  ApiError if the API could not be reached, otherwise None.
+        """
+        transport = self.config.get('transport') or RequestsTransport(self.opener)
         try:
-            res = urlopen(self.api_url, **{"params" if is_get else "data": params})
-        except (requests.HTTPError, requests.ConnectionError) as e:
-            # We need something that can be arbitrarily assigned attributes
-            res = lambda: 0
-            res.json = lambda: {}
-            raiseme = exc.ApiError(e)
+            ret, headers = transport.request(self.api_url, params, is_get)
+        except exc.ApiError as e:
+            self.last_query = time()
+            return {}, e, {}
         self.last_query = time()
+        if ret is None:
+            return _no_json(), None, headers
+        return ret, None, headers
+
+    # These are shared with AsyncMediaWiki's version of _call
+
+    def _limiter(self, is_get):
+        """Returns the AdaptiveLimiter for reads or writes, brought up to
+        date with the config."""
+        kind = "read" if is_get else "write"
+        rates = self.config.get('rates', {})
+        concurrency = self.config.get('concurrency', {})
+        throttle = self.config['throttle']
+        if rates.get("read") is None and rates.get("write") is None:
+            # Only the throttle is set, which is for every request
+            limits = [n for n in concurrency.values() if n]
+            limiter = self._limiters["throttle"]
+            limiter.configure(1 / throttle if throttle else 0, 1,
+                              min(limits, default=0))
+            return limiter
+        rate = rates.get(kind)
+        if rate is None:
+            rate = (1 / throttle if throttle else 0), 1
+        limiter = self._limiters[kind]
+        limiter.configure(rate[0], rate[1], concurrency.get(kind) or 0)
+        return limiter
+
+    def _cache_key(self, params, is_get):
+        """Returns the key to cache the result of *params* under, or None
+        if it shouldn't be cached."""
+        cache = self.config.get('cache')
+        if cache is None or not is_get:
+            return None
+        # Purging isn't read-only, and tokens shouldn't outlive a session
+        meta = str(params.get('meta', '')).split("|")
+        if params['action'] == "purge" or "tokens" in meta:
+            return None
+        return cache.key(params)
+
+    def _invalidate(self, *pages):
+        """Forget the cached results that mention any of *pages*, which are
+        titles or pageids."""
+        cache = self.config.get('cache')
+        if cache is not None:
+            cache.invalidate(*pages)
+
+    @staticmethod
+    def _new_opener():
+        """Returns the ``requests.Session`` that sends the queries."""
+        # requests takes a while to import, so it isn't until it's needed
+        import requests
+        opener = requests.Session()
+        opener.headers.update({"User-Agent": USER_AGENT})
+        return opener
+
+    def _new_session(self):
+        """Forget whatever depends on who is logged in."""
+        self._chunk = None
+        cache = self.config.get('cache')
+        if cache is not None:
+            cache.clear()
+
+    @staticmethod
+    def _is_lagged(ret):
+        return ret.get('error', {}).get('code') == 'maxlag'
+
+    def _lag(self, ret, headers):
+        """Returns ``(lag, wait)`` for a maxlag error: how many seconds the
+        replicas are lagging by (None if unknown), and how long to wait
+        before trying again."""
+        error = ret['error']
+        lag = error.get("lag", headers.get("X-Database-Lag"))
+        if lag is None:
+            found = re.search(r"([\d.]+) seconds? lagged", error.get("info", ""))
+            lag = found and found.group(1)
         try:
-            ret = res.json()
-        except ValueError:
-            ret = {"error": {"code": "py", "info": "No JSON object could be decoded"}}
-        if 'error' in ret:
-            if ret['error']['code'] == 'maxlag':
-                try:
-                    retries = int(conf['retries']),
-                except OverflowError:
-                    retries = ()
-                err = "Maximum number of retries reached ({0})"
-                for _ in itertools.repeat(None, *retries):
-                    sleep(conf['sleep'])
-                    try:
-                        res = urlopen(self.api_url, **{"params" if is_get else "data": params})
-                        ret = res.json()
-                    except (requests.HTTPError, requests.ConnectionError) as e:
-                        raiseme = exc.ApiError(e)
-                    if 'error' not in ret:
-                        break
-                else:
-                    raiseme = exc.ApiError(err.format(retries[0]))
-            else:
-                raiseme = exc.CeterachError(ret['error']['info'])
+            wait = float(headers["Retry-After"])
+        except (KeyError, ValueError):
+            wait = self.config['sleep']
+        return (float(lag) if lag else None), wait
+
+    def _too_many_retries(self):
+        err = "Maximum number of retries reached ({0})"
+        return exc.ApiError(err.format(self.config['retries']))
+
+    @staticmethod
+    def _result(ret, raiseme):
+        """Returns *ret*, or raises *raiseme* or whatever error *ret*
+        describes."""
+        if raiseme is None and 'error' in ret:
+            raiseme = exc.CeterachError(ret['error']['info'])
         if raiseme:
-            if 'error' not in ret:
-                code = 'py'
-            else:
-                code = ret["error"].get("code", "py")
-            raiseme.response = ret['error'].get(code)
+            error = ret.get('error', {})
+            code = error.get("code", "py")
+            raiseme.response = error.get(code)
             raiseme.code = code
             raise raiseme
         return ret
@@ -253,6 +904,10 @@ class MediaWiki:
         If the action is not specified it defaults to 'query'. The format
         key will be set to 'json'.
 
+        If the *use_cache* parameter (likewise accepted only as a kwarg) is
+        False, the query is sent even if MediaWiki.config['cache'] has its
+        result, and the result isn't cached.
+
         To illustrate this, suppose that ``api = MediaWiki()`` and
         ``api.config["defaults"] = {"default": 1}``. The call method, given
         these arguments, will send the dict in the comment to the API::
@@ -269,7 +924,9 @@ class MediaWiki:
         if not params:
             params = {}
         use_defaults = more_params.pop("use_defaults", True)
-        return self._call(params, more_params, use_defaults=use_defaults)
+        use_cache = more_params.pop("use_cache", True)
+        return self._call(params, more_params, use_defaults=use_defaults,
+                          use_cache=use_cache)
 
     def login(self, username, password):
         """Try to log in with the given username and password.
@@ -280,6 +937,7 @@ class MediaWiki:
         :param password: Password that corresponds to the username.
         :returns: True if the login succeeded, False if not.
         """
+        self._new_session()
         params = {"action": "login", "lgname": username, "lgpassword": password}
         result = self.call(params, use_defaults=False)
         if result['login']['result'] == "Success":
@@ -296,6 +954,7 @@ class MediaWiki:
 
         :returns: True
         """
+        self._new_session()
         return len(self.call(action="logout", use_defaults=False)) == 0
 
     def set_token(self, *args):
@@ -306,12 +965,19 @@ class MediaWiki:
 
         :param args: Strings that represent token names
         """
+        res = self.call(self._token_query(args))
+        self._store_tokens(res)
+
+    @staticmethod
+    def _token_query(args):
         if not args:
             args = {"csrf"}
-        query = {"action": "query", "meta": "tokens", "type": set(args)}
-        res = self.call(query)
-        for token_name, token_value in res['query']['tokens'].items():
-            self._tokens[token_name[:-5]] = token_value
+        return {"action": "query", "meta": "tokens", "type": set(args)}
+
+    def _store_tokens(self, res):
+        with self._lock:
+            for token_name, token_value in res['query']['tokens'].items():
+                self._tokens[token_name[:-5]] = token_value
 
     def expand_templates(self, title, text, include_comments=False) -> str:
         """Evaluate the templates in *text* and return the processed result.
@@ -338,7 +1004,8 @@ class MediaWiki:
             params['includecomments'] = True
         return self.call(params, use_defaults=False)['expandtemplates']["*"]
 
-    def olditerator(self, params=None, limit=float("inf"), **more_params):
+    def olditerator(self, params=None, limit=float("inf"), prefetch=0,
+                    continuation=None, checkpoint=None, **more_params):
         """Iterates over an API query, so you no longer have to use something like: ::
             >>> res = api.call(action="query", ...)
             >>> res["query"]["pages"][tuple(res["query"]["pages"].keys())[0]][...]
@@ -348,6 +1015,27 @@ class MediaWiki:
         :type limit: numbers.Real
         :param limit: The maximum number of items the iterator will yield.
                       Defaults to infinity.
+        :type prefetch: int
+        :param prefetch: How many responses to request ahead of the ones
+                         being iterated over, in a background thread, so that
+                         waiting for the wiki overlaps with processing the
+                         items. Defaults to 0, which requests the next
+                         response only when it is needed.
+        :type continuation: dict
+        :param continuation: A dict that the iterator keeps up to date with
+                             where it is, as ``{"continue": ..., "offset":
+                             ...}``: the continuation parameters of the
+                             current response, and how many of its items
+                             have been consumed. An item counts as consumed
+                             once the next one is asked for. Pass one that a
+                             stopped iterator left behind to carry on from
+                             there.
+        :type checkpoint: str
+        :param checkpoint: The path of a file to save the continuation in
+                           whenever a response is started and when the
+                           iterator stops. If the file exists, the iterator
+                           carries on from it. It is deleted once the query
+                           is finished.
         :param more_params: Parameters to the query, which will be added to
                             *params*. See .call() for similar behaviour.
 
@@ -363,44 +1051,12 @@ class MediaWiki:
             {'ns': 0, 'pageid': 600744, 'title': '!!!'}
 
         """
-        if not params:
-            params = {}
-        params = params.copy()
-        l = 0
-        while True:
-            res = self.call(params, rawcontinue='', **more_params)
-            # print("QUERY")
-            if isinstance(res['query'], list):
-                return
-            res['query'].pop("normalized", 0)
-            res['query'].pop("redirects", 0)
-            res['query'].pop("interwiki", 0)
-            a_res = res['query'].values()
-            if len(a_res) > 1:
-                # eg if you specify both a list= and prop=
-                X = ValueError
-                err = "Too many nodes under the query node: "
-                raise X(err + ", ".join(res['query'].keys()))
-            else:
-                ret = list(a_res)[0]
-                if isinstance(ret, dict):
-                    ret = list(ret.values())
-            for r in ret:
-                yield r
-                l += 1
-                if l >= limit:
-                    return
-            if 'query-continue' in res:
-                c, p = {}, {}
-                for p_, n in res['query-continue'].items():
-                    for k, v in n.items():
-                        c[k] = v
-                        p[p_] = 1  # what is this even doing here
-            else:
-                return
-            params.update(c)
+        return self._iterate(params, limit, more_params, True, prefetch,
+                             continuation, checkpoint)
 
-    def newiterator(self, params=None, limit=float("inf"), **more_params):
+    def newiterator(self, params=None, limit=float("inf"), prefetch=0,
+                    continuation=None, checkpoint=None, merge=False,
+                    **more_params):
         """Iterates over an API query, so you no longer have to use something like: ::
             >>> res = api.call(action="query", ...)
             >>> res["query"]["pages"][tuple(res["query"]["pages"].keys())[0]][...]
@@ -410,6 +1066,35 @@ class MediaWiki:
         :type limit: numbers.Real
         :param limit: The maximum number of items the iterator will yield.
                       Defaults to infinity.
+        :type prefetch: int
+        :param prefetch: How many responses to request ahead of the ones
+                         being iterated over, in a background thread, so that
+                         waiting for the wiki overlaps with processing the
+                         items. Defaults to 0, which requests the next
+                         response only when it is needed.
+        :type continuation: dict
+        :param continuation: A dict that the iterator keeps up to date with
+                             where it is, as ``{"continue": ..., "offset":
+                             ...}``: the continuation parameters of the
+                             current response, and how many of its items
+                             have been consumed. An item counts as consumed
+                             once the next one is asked for. Pass one that a
+                             stopped iterator left behind to carry on from
+                             there.
+        :type checkpoint: str
+        :param checkpoint: The path of a file to save the continuation in
+                           whenever a response is started and when the
+                           iterator stops. If the file exists, the iterator
+                           carries on from it. It is deleted once the query
+                           is finished.
+        :type merge: bool
+        :param merge: If True, the data that each page gets from ``prop=``
+                      modules is collected across responses, and the pages
+                      are only yielded once they are complete, i.e. once
+                      the wiki says the batch is complete. Items of
+                      ``list=`` modules are yielded as they arrive, before
+                      the pages of their batch, instead of raising
+                      ValueError for having more than one module.
         :param more_params: Parameters to the query, which will be added to
                             *params*. See .call() for similar behaviour.
 
@@ -425,40 +1110,308 @@ class MediaWiki:
             {'ns': 0, 'pageid': 600744, 'title': '!!!'}
 
         """
-        if not params:
-            params = {}
-        params = params.copy()
+        return self._iterate(params, limit, more_params, False, prefetch,
+                             continuation, checkpoint, merge)
+
+    def _iterate(self, params, limit, more_params, raw, prefetch=0,
+                 continuation=None, checkpoint=None, merge=False):
+        params = dict(params or {})
+        if raw:
+            more_params = dict(more_params, rawcontinue='')
+        state = self._resume(continuation, checkpoint)
+        if state.get("done"):
+            return
+        skip = state["offset"]
+        batches = self._batches(params, more_params, raw, state["continue"],
+                                merge)
+        if prefetch:
+            batches = prefetched(batches, prefetch)
+        l = 0
+        try:
+            for (cont, items) in batches:
+                # Responses that merge into the same batch share a *cont*
+                if cont is not state["continue"]:
+                    state.update({"continue": cont, "offset": skip})
+                    self._save(state, checkpoint)
+                for r in items:
+                    if skip:
+                        skip -= 1
+                        continue
+                    yield r
+                    # Only once the consumer asks for the next one
+                    state["offset"] += 1
+                    l += 1
+                    if l >= limit:
+                        return
+            state["done"] = True
+            if checkpoint is not None and os.path.exists(checkpoint):
+                os.remove(checkpoint)
+        finally:
+            # Stops the background thread if there is one
+            batches.close()
+            if not state.get("done"):
+                self._save(state, checkpoint)
+
+    @staticmethod
+    def _resume(continuation, checkpoint):
+        """Returns the iterator state to start from, which is *continuation*
+        itself if it isn't None."""
+        state = continuation if continuation is not None else {}
+        if not state and checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                state.update(json.load(f))
+        state.setdefault("continue", {})
+        state.setdefault("offset", 0)
+        return state
+
+    @staticmethod
+    def _save(state, checkpoint):
+        if checkpoint is None:
+            return
+        # Write it somewhere else first, so a crash can't leave half a file
+        with open(checkpoint + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(checkpoint + ".tmp", checkpoint)
+
+    def sharded_iterator(self, shards, params=None, workers=4, ordered=False,
+                         key=None, limit=float("inf"), **more_params):
+        """Iterates over an API query that is split into independent
+        *shards*, listing up to *workers* of them at once.
+
+        A long listing has to be fetched one response at a time, since each
+        continuation depends on the one before it. Splitting it into ranges
+        with :mod:`ceterach.shards`, for example: ::
+
+            >>> from ceterach.shards import title_shards
+            >>> shards = title_shards(("F", "M", "S"))
+            >>> for p in api.sharded_iterator(shards, list="allpages",
+            ...                               key=lambda r: r['title']):
+            ...     print(p)
+
+        lets the ranges be fetched side by side, so that the listing is only
+        as slow as the rate limits allow.
+
+        :type shards: iterable
+        :param shards: Dicts of parameters, each of which is added to
+                       *params* to make one of the queries.
+        :type params: dict
+        :param params: Parameters to every query.
+        :type workers: int
+        :param workers: How many shards can be listed at once.
+        :type ordered: bool
+        :param ordered: If True, the items are yielded in the order of
+                        *shards*, which is the order of one big listing if
+                        the shards came from :mod:`ceterach.shards`. Shards
+                        further along are buffered, a little at a time,
+                        until their turn. Otherwise, items are yielded as
+                        soon as they arrive.
+        :param key: A function that returns what identifies an item, e.g.
+                    its title. If given, the first item of a shard is
+                    dropped if it is the same as the last item of the shard
+                    before it, for shards whose ranges include both ends.
+        :type limit: numbers.Real
+        :param limit: The maximum number of items to yield.
+        :param more_params: Parameters to every query, which will be added
+                            to *params*. See .call() for similar behaviour.
+        :returns: A generator that probably contains dicts.
+        """
+        shards = [dict(params or {}, **shard) for shard in shards]
+        more_params = dict(more_params, rawcontinue='')
+        if ordered:
+            queues = [queue.Queue(maxsize=2) for _ in shards]
+        else:
+            queues = [queue.Queue(maxsize=2 * workers)] * len(shards)
+        stop = threading.Event()
+        done = object()
+
+        def run(i):
+            q = queues[i]
+            try:
+                for (_, items) in self._batches(shards[i], more_params, True):
+                    if not offer(q, (i, items, None), stop):
+                        return
+            except Exception as e:
+                offer(q, (i, done, e), stop)
+            else:
+                offer(q, (i, done, None), stop)
+
+        def events():
+            finished = 0
+            while finished < len(shards):
+                # In order, each shard's queue is emptied before the next's
+                i, items, error = queues[finished if ordered else 0].get()
+                if error is not None:
+                    raise error
+                if items is done:
+                    finished += 1
+                yield i, items
+
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=workers)
+        futures = [pool.submit(run, i) for i in range(len(shards))]
+        join = self._shard_joiner(done, key)
         l = 0
+        try:
+            for (i, items) in events():
+                for item in join(i, items):
+                    yield item
+                    l += 1
+                    if l >= limit:
+                        return
+        finally:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    @staticmethod
+    def _shard_joiner(done, key):
+        """Returns a function that takes each ``(shard, items)`` pair as it
+        arrives, where *items* is *done* at the end of each shard, and
+        returns the items that can be yielded so far. If *key* is given,
+        duplicates at the boundaries between shards are dropped."""
+        missing = object()
+        last = {}  # The key of the last item of each shard so far
+        held = {}  # The first item of a shard whose previous shard isn't done
+        finished = set()
+
+        def join(i, items):
+            ready = []
+            if items is done:
+                finished.add(i)
+                j = i + 1
+                while j in held and j - 1 in finished:
+                    item = held.pop(j)
+                    if key(item) != last.get(j - 1, missing):
+                        ready.append(item)
+                    j += 1
+                return ready
+            if key is None:
+                return items
+            for item in items:
+                k = key(item)
+                first = i not in last
+                last[i] = k
+                if first and i > 0:
+                    if i - 1 not in finished:
+                        held[i] = item
+                        continue
+                    if k == last.get(i - 1, missing):
+                        continue
+                ready.append(item)
+            return ready
+
+        return join
+
+    def _batches(self, params, more_params, raw, cont=None, merge=False):
+        """Yields ``(continuation, items)`` for each response to *params*,
+        following the continuation, where *continuation* is what was added
+        to *params* to get the first response of the batch, starting with
+        *cont*. If *merge* is True, see :meth:`_merge_batch`."""
+        cont = dict(cont or {})
+        base = dict(params)
+        params.update(cont)
+        group, pages = cont, {}
         while True:
             res = self.call(params, **more_params)
-            if isinstance(res['query'], list):
-                return
-            res['query'].pop("normalized", 0)
-            res['query'].pop("redirects", 0)
-            res['query'].pop("interwiki", 0)
-            a_res = res['query'].values()
-            if len(a_res) > 1:
-                # eg if you specify both a list= and prop=
-                X = ValueError
-                err = "Too many nodes under the query node: "
-                raise X(err + ", ".join(res['query'].keys()))
+            if merge:
+                items, complete = self._merge_batch(res, pages)
             else:
-                ret = list(a_res)[0]
-                if isinstance(ret, dict):
-                    ret = list(ret.values())
-            for r in ret:
-                yield r
-                l += 1
-                if l >= limit:
+                items, complete = self._query_items(res), True
+                if items is None:
                     return
-            if 'continue' in res:
-                c = res['continue']  # easy stuff now
-            else:
+            yield group, items
+            c = self._continuation(res, raw)
+            if c is None:
                 return
-            params.update(c)
+            if raw:
+                params.update(c)
+                cont = dict(cont, **c)
+            else:
+                # Each continue replaces the one before it
+                params, cont = dict(base, **c), c
+            if complete:
+                group = cont
+
+    @staticmethod
+    def _merge_batch(res, pages):
+        """Merges the pages in *res* into *pages*, which maps the pageids
+        (or titles) of the current batch to what is known about them so
+        far.
+
+        :returns: ``(items, complete)``, where *items* are the items of the
+                  other modules in *res*, followed by the pages if the
+                  batch is *complete*.
+        """
+        query = res.get('query', {})
+        items = []
+        for (name, node) in (query.items() if isinstance(query, dict) else ()):
+            if name in ("normalized", "redirects", "interwiki"):
+                continue
+            node = list(node.values()) if isinstance(node, dict) else node
+            if name != "pages":
+                items.extend(node)
+                continue
+            for page in node:
+                pageid = page.get("pageid", -1)
+                merged = pages.setdefault(pageid if pageid > 0
+                                          else page.get("title"), {})
+                for (k, v) in page.items():
+                    if isinstance(v, list) and k in merged:
+                        merged[k].extend(v)
+                    else:
+                        merged.setdefault(k, v)
+        if 'batchcomplete' in res or 'continue' not in res:
+            items.extend(pages.values())
+            pages.clear()
+            return items, True
+        return items, False
+
+    @staticmethod
+    def _query_items(res):
+        """Returns the items under the query node of *res*, or None if there
+        aren't any."""
+        if isinstance(res['query'], list):
+            return None
+        res['query'].pop("normalized", 0)
+        res['query'].pop("redirects", 0)
+        res['query'].pop("interwiki", 0)
+        a_res = res['query'].values()
+        if len(a_res) > 1:
+            # eg if you specify both a list= and prop=
+            X = ValueError
+            err = "Too many nodes under the query node: "
+            raise X(err + ", ".join(res['query'].keys()))
+        ret = list(a_res)[0]
+        if isinstance(ret, dict):
+            ret = list(ret.values())
+        return ret
+
+    @staticmethod
+    def _continuation(res, raw):
+        """Returns the parameters that continue the query which returned
+        *res*, or None if it's finished. *raw* is True if *res* uses the
+        ``query-continue`` format."""
+        if not raw:
+            return res.get('continue')
+        if 'query-continue' not in res:
+            return None
+        c = {}
+        for n in res['query-continue'].values():
+            c.update(n)
+        return c
 
     iterator = olditerator
 
+    @property
+    def limiters(self) -> dict:
+        """A mapping of ``"read"`` and ``"write"`` to the
+        :class:`ceterach.throttle.AdaptiveLimiter` that paces those
+        requests. Their ``state`` shows the current rate and concurrency,
+        and the last lag that the wiki reported. They are the same limiter
+        if the *rates* config key is only None."""
+        return {"read": self._limiter(True), "write": self._limiter(False)}
+
     @property
     def tokens(self):
         """A mapping of the token name to the token."""
@@ -468,9 +1421,15 @@ class MediaWiki:
     def namespaces(self):
         """A mapping of the namespace number to the namespace name."""
         if self._namespaces is None:
-            self._namespaces = {}
+            # The lock isn't held while waiting for the wiki, since page()
+            # and user() need it. If two threads ask at once, the first
+            # answer is kept.
+            namespaces = {}
             for ns in self.iterator(use_defaults=False,
                                     meta="siteinfo", siprop="namespaces"):
                 nsid = ns['id']
-                self._namespaces[nsid] = ns["*"]
+                namespaces[nsid] = ns["*"]
+            with self._lock:
+                if self._namespaces is None:
+                    self._namespaces = namespaces
         return self._namespaces
@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import weakref
+
+from .page import Page
+from .revision import Revision
+from .user import User
+
+__all__ = ["Batch"]
+
+# The attribute that each kind of object always has once it's been loaded
+_LOADED = ((Page, "_namespace"), (User, "_exists"), (Revision, "_page"))
+
+
+class Batch:
+    """Collects the Pages, Users, and Revisions that a MediaWiki object
+    creates, so that the first time one of them needs to load an attribute,
+    all of the others that are missing it are loaded alongside it, with as
+    few queries as possible.
+
+    You shouldn't need to make one of these yourself; use
+    :meth:`ceterach.api.MediaWiki.batch` instead.
+    """
+
+    def __init__(self, api):
+        self._api = api
+        self._pending = {kind: [] for (kind, _) in _LOADED}
+
+    def __repr__(self):
+        cls_name = type(self).__name__
+        text = "{c}(api={self._api!r})"
+        return text.format(c=cls_name, self=self)
+
+    def _kind(self, obj):
+        for (kind, loaded) in _LOADED:
+            if isinstance(obj, kind):
+                return kind, loaded
+        return None, None
+
+    def add(self, obj):
+        """Remember *obj*, so that it's loaded in bulk when needed."""
+        kind, _ = self._kind(obj)
+        if kind is not None:
+            self._pending[kind].append(weakref.ref(obj))
+
+    def flush(self, obj, attr):
+        """Load *obj* along with every other remembered object of the same
+        kind that doesn't have *attr*.
+
+        :returns: True if *obj* was loaded, False if it should be loaded the
+                  usual way.
+        """
+        kind, loaded = self._kind(obj)
+        if kind is None:
+            return False
+        objs, alive = [obj], []
+        for ref in self._pending[kind]:
+            o = ref()
+            if o is None:
+                continue
+            alive.append(ref)
+            if o is not obj and not hasattr(o, attr):
+                objs.append(o)
+        self._pending[kind] = alive
+        if kind is Page:
+            loader = self._api.pages(objs)
+        elif kind is User:
+            loader = self._api.users(objs)
+        else:
+            # Only download the content if it's what was asked for
+            content = attr in {"_content", "_is_deleted"}
+            loader = self._api.revisions(objs, content=content)
+        for _ in loader:
+            pass
+        return hasattr(obj, loaded)
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import json
+import threading
+import collections
+from time import monotonic
+
+from .utils import normalize
+
+__all__ = ["ResponseCache"]
+
+# Parameters whose values are titles or pageids, so that queries can be
+# invalidated before they have even been answered
+_TITLE_PARAMS = ("titles", "title", "page", "cmtitle", "gcmtitle", "from", "to")
+_PAGEID_PARAMS = ("pageids", "pageid", "cmpageid", "gcmpageid", "fromid")
+
+
+class ResponseCache:
+    """Remembers the results of read-only API queries, so that asking the
+    same thing twice only takes one request.
+
+    Pass one to :class:`ceterach.api.MediaWiki` as the *cache* config key.
+    Entries are dropped when they are older than *ttl* seconds, and the
+    least recently used ones are dropped when there are more than
+    *max_entries* of them or they take up more than *max_bytes* bytes of
+    JSON. Any of those can be 0 for no limit.
+
+    Entries are also dropped when a page they mention, by title or by
+    pageid, is changed with :meth:`invalidate`, which the write methods of
+    :class:`ceterach.page.Page` do for you.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=0, ttl=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (expiry, JSON text, titles)
+        self._entries = collections.OrderedDict()
+        # title or pageid -> keys of the entries that mention it
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        cls_name = type(self).__name__
+        text = "{c}(max_entries={self.max_entries!r}, " \
+               "max_bytes={self.max_bytes!r}, ttl={self.ttl!r})"
+        return text.format(c=cls_name, self=self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(params):
+        """Returns the key for the query with the parameters *params*."""
+        return tuple(sorted((k, str(v)) for (k, v) in params.items()))
+
+    def get(self, key):
+        """Returns a fresh copy of the result stored under *key*, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and entry[0] < monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return json.loads(entry[1])
+
+    def set(self, key, params, result):
+        """Stores *result*, the result of the query with the parameters
+        *params*, under *key*."""
+        text = json.dumps(result)
+        pages = set(_pages(result))
+        for k in _TITLE_PARAMS:
+            if k in params:
+                pages.update(str(params[k]).split("|"))
+        for k in _PAGEID_PARAMS:
+            if k in params:
+                pages.update(int(p) for p in str(params[k]).split("|")
+                             if p.isdigit())
+        pages = {_page_key(p) for p in pages if p}
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = monotonic() + self.ttl, text, pages
+            self.size += len(text)
+            for p in pages:
+                self._pages.setdefault(p, set()).add(key)
+            while self._entries and (
+                    (self.max_entries and len(self._entries) > self.max_entries) or
+                    (self.max_bytes and self.size > self.max_bytes)):
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, *pages):
+        """Forget every result that mentions any of *pages*, which are
+        titles or pageids. Empty titles and pageids that aren't positive
+        are skipped."""
+        with self._lock:
+            for p in pages:
+                if not p or (isinstance(p, int) and p < 0):
+                    continue
+                for key in self._pages.pop(_page_key(p), ()):
+                    if key in self._entries:
+                        self._drop(key)
+
+    def clear(self):
+        """Forget everything."""
+        with self._lock:
+            self._entries.clear()
+            self._pages.clear()
+            self.size = 0
+
+    def _drop(self, key):
+        _, text, pages = self._entries.pop(key)
+        self.size -= len(text)
+        for p in pages:
+            keys = self._pages.get(p)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._pages[p]
+
+
+def _page_key(page):
+    # Titles and pageids can't be mixed up, since only titles are strings
+    return page if isinstance(page, int) else normalize(page)
+
+
+def _pages(node):
+    """Yields every title and pageid found in an API result."""
+    if isinstance(node, dict):
+        for (k, v) in node.items():
+            if k in ("title", "from", "to") and isinstance(v, str):
+                yield v
+            elif k == "pageid" and isinstance(v, int) and v > 0:
+                yield v
+            elif isinstance(v, (dict, list)):
+                for p in _pages(v):
+                    yield p
+    elif isinstance(node, list):
+        for v in node:
+            for p in _pages(v):
+                yield p
@@ -17,10 +17,19 @@
 # along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
 # ------------------------------------------------------------------------------
 
+import queue
+import threading
+
 from .page import Page
+from .utils import offer
 
 class Category(Page):
 
+    __slots__ = ("_members", "_subcats")
+
+    #: The fields that :meth:`iter_members` loads without content.
+    _member_fields = Page._info_fields + ("revision_user", "protection")
+
     def load_attributes(self, res=None):
         super().load_attributes(res)
         self._members = []
@@ -64,6 +73,119 @@ class Category(Page):
                 p.load_attributes(r)
                 self._members.append(p)
 
+    def iter_members(self, namespaces=None, types=None, content=False):
+        """Iterate over the pages in this category, including subcategories
+        and files, as the API returns them.
+
+        Unlike :attr:`members` and :attr:`subcats`, nothing is kept around,
+        so this is what should be used for large categories. Members in the
+        Category and File namespaces are yielded as Categories and Files.
+
+        :type namespaces: iterable
+        :param namespaces: The namespace numbers to limit the members to,
+                           or None for all of them.
+        :type types: iterable
+        :param types: Any of ``"page"``, ``"subcat"`` and ``"file"`` to limit
+                      the members to, or None for all of them.
+        :type content: bool
+        :param content: Whether to download the content of the members as
+                        well. If False, the content, and the categories that
+                        the members are in, will be loaded when they are
+                        first needed.
+        :returns: A generator of Pages, Categories and Files.
+        """
+        params = {
+            "generator": "categorymembers",
+            "gcmtitle": self.title,
+            "gcmlimit": "max",
+            "prop": ('info', 'revisions'),
+            "inprop": ("protection",),
+            "rvprop": ('ids', 'flags', 'timestamp', 'user', 'comment'),
+        }
+        fields = self._member_fields
+        if content:
+            params['rvprop'] += ('content',)
+            fields += ("content",)
+        if namespaces is not None:
+            params['gcmnamespace'] = tuple(namespaces)
+        if types is not None:
+            params['gcmtype'] = (types,) if isinstance(types, str) else tuple(types)
+        # Merged, so that a member whose props are continued is only
+        # loaded once it's complete
+        for r in self._api.newiterator(params, merge=True, use_defaults=False):
+            p = self._api._page_from(r, fields)
+            if p is not None:
+                yield p
+
+    def walk(self, depth=float("inf"), workers=4, namespaces=None,
+             content=False):
+        """Iterate over the pages in this category and its subcategories,
+        down to *depth* levels of subcategories.
+
+        The categories are listed by *workers* threads at once, breadth
+        first, with :meth:`iter_members`, and members are yielded as soon
+        as they are found. Every member is yielded once, even if it is in
+        more than one of the categories, and a category that (indirectly)
+        contains itself is only listed once.
+
+        :type depth: int
+        :param depth: How many levels of subcategories to go into. If it is
+                      0, only the members of this category are yielded.
+        :type workers: int
+        :param workers: How many categories can be listed at once.
+        :type namespaces: iterable
+        :param namespaces: The namespace numbers to limit the yielded
+                           members to, or None for all of them.
+                           Subcategories are walked either way.
+        :type content: bool
+        :param content: Passed to :meth:`iter_members`.
+        :returns: A generator of Pages, Categories and Files.
+        """
+        if namespaces is not None:
+            namespaces = set(namespaces)
+        listed = None if namespaces is None else namespaces | {14}
+        results = queue.Queue(maxsize=500)
+        stop = threading.Event()
+
+        def list_members(cat, level):
+            # Give up if the walk was abandoned, instead of blocking forever
+            try:
+                for member in cat.iter_members(listed, content=content):
+                    if not offer(results, (level, member, None), stop):
+                        return
+            except Exception as e:
+                offer(results, (level, None, e), stop)
+            else:
+                offer(results, (level, None, None), stop)
+
+        seen = {self.pageid} if self.pageid > 0 else set()
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=workers)
+        futures = [pool.submit(list_members, self, 0)]
+        pending = 1
+        try:
+            while pending:
+                level, member, error = results.get()
+                if member is None:
+                    # A category is done
+                    if error is not None:
+                        raise error
+                    pending -= 1
+                    continue
+                if member.pageid in seen or member == self:
+                    continue
+                seen.add(member.pageid)
+                if member.namespace == 14 and level < depth:
+                    futures.append(pool.submit(list_members, member, level + 1))
+                    pending += 1
+                if namespaces is None or member.namespace in namespaces:
+                    yield member
+        finally:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
     @property
     def members(self):
         """Iterate over Pages in the category."""
@@ -0,0 +1,240 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import bz2
+import gzip
+import multiprocessing
+import os
+from xml.etree import ElementTree
+
+from .page import Page
+from .revision import Revision
+
+__all__ = ["parse", "pages", "revisions"]
+
+#: What a dump has to say about each Page and Revision.
+_page_fields = Page._info_fields + ("content", "revision_user")
+_revision_fields = tuple(f for f in Revision._field_params if f != "rvtoken")
+
+#: How many results a worker process sends back at once.
+_BATCH = 100
+
+
+def _open(path):
+    path = os.fspath(path)
+    if path.endswith(".gz"):
+        return gzip.open(path)
+    elif path.endswith(".bz2"):
+        return bz2.open(path)
+    return open(path, "rb")
+
+
+def _revision(elem, ns):
+    children = {child.tag[len(ns):]: child for child in elem}
+    rev = {
+        "revid": int(children["id"].text),
+        "parentid": int(children["parentid"].text) if "parentid" in children else 0,
+        "timestamp": children["timestamp"].text,
+    }
+    # Like the API, leave out whatever was deleted
+    contributor = children.get("contributor")
+    if contributor is not None and contributor.get("deleted") is None:
+        for child in contributor:
+            if child.tag[len(ns):] in {"username", "ip"}:
+                rev['user'] = child.text
+    comment = children.get("comment")
+    if comment is None:
+        rev['comment'] = ""
+    elif comment.get("deleted") is None:
+        rev['comment'] = comment.text or ""
+    if "minor" in children:
+        rev['minor'] = ""
+    text = children.get("text")
+    if text is not None and text.get("deleted") is None:
+        rev['*'] = text.text or ""
+    return rev
+
+
+def parse(path, latest=False):
+    """Read the XML dump at *path*, and yield what it says about each
+    revision in the form that the API would have, i.e. ``{"pageid": ...,
+    "ns": ..., "title": ..., "revisions": (revision,)}``.
+
+    The dump is read a bit at a time, and everything that has been yielded
+    is thrown away, so this takes the same amount of memory no matter how
+    big the dump is.
+
+    :type path: str
+    :param path: The path to the dump. Dumps whose names end with ``.gz``
+                 or ``.bz2`` are decompressed as they are read.
+    :type latest: bool
+    :param latest: Set this to True to only yield the last revision of each
+                   page, which is the current one. That revision also has
+                   the ``"lastrevid"`` of its page.
+    :returns: A generator of dicts.
+    """
+    with _open(path) as f:
+        context = ElementTree.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        ns = root.tag[:root.tag.index("}") + 1] if "}" in root.tag else ""
+        tags = [root.tag[len(ns):]]
+        page = page_elem = pending = None
+        for (event, elem) in context:
+            tag = elem.tag[len(ns):]
+            if event == "start":
+                tags.append(tag)
+                if tag == "page":
+                    page, page_elem = {}, elem
+                continue
+            tags.pop()
+            if tag == "revision":
+                rev = _revision(elem, ns)
+                # A page can have any number of revisions, so they're thrown
+                # away as soon as they've been read
+                page_elem.remove(elem)
+                if pending is not None and not latest:
+                    yield dict(page, revisions=(pending,))
+                pending = rev
+            elif tag == "page":
+                if pending is not None:
+                    yield dict(page, lastrevid=pending['revid'],
+                               revisions=(pending,))
+                page = page_elem = pending = None
+                root.clear()
+            elif page is not None and tags[-1] == "page":
+                if tag in {"id", "ns"}:
+                    page["pageid" if tag == "id" else tag] = int(elem.text)
+                elif tag == "title":
+                    page['title'] = elem.text
+                elif tag == "redirect":
+                    page['redirect'] = ""
+
+
+def _work(paths, results, latest):
+    # This runs in a worker process. What it parses is sent back in
+    # batches, since every put() pickles and writes to a pipe.
+    try:
+        for path in iter(paths.get, None):
+            batch = []
+            for res in parse(path, latest):
+                batch.append(res)
+                if len(batch) == _BATCH:
+                    results.put(batch)
+                    batch = []
+            if batch:
+                results.put(batch)
+    except Exception as e:
+        results.put(e)
+    results.put(None)
+
+
+def _parsed(paths, processes, latest):
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    else:
+        paths = list(paths)
+    if not processes:
+        for path in paths:
+            yield from parse(path, latest)
+        return
+    todo = multiprocessing.Queue()
+    # Bounded, so that the workers can't get too far ahead
+    results = multiprocessing.Queue(maxsize=processes * 4)
+    workers = []
+    for path in paths:
+        todo.put(path)
+    for _ in range(min(processes, len(paths))):
+        todo.put(None)
+        worker = multiprocessing.Process(target=_work, daemon=True,
+                                         args=(todo, results, latest))
+        worker.start()
+        workers.append(worker)
+    running = len(workers)
+    try:
+        while running:
+            batch = results.get()
+            if batch is None:
+                running -= 1
+            elif isinstance(batch, Exception):
+                raise batch
+            else:
+                yield from batch
+    finally:
+        # The workers are still going if the generator was abandoned
+        for worker in workers:
+            worker.terminate()
+            worker.join()
+
+
+def pages(api, paths, processes=0):
+    """Yield the current version of every page in the XML dumps at *paths*,
+    as Pages, Categories and Files, without querying the API.
+
+    The title, pageid, namespace, content, whether it's a redirect, the
+    current revid and the user who made the current revision are loaded
+    from the dump. Anything else that a dump doesn't have, like the
+    protection and the categories, is loaded from the API when it is first
+    needed, as usual.
+
+    :type api: :class:`ceterach.api.MediaWiki`
+    :param api: The wiki that the dumps are from.
+    :type paths: str or iterable
+    :param paths: The path to a dump, or an iterable of them. See
+                  :func:`parse`.
+    :type processes: int
+    :param processes: How many processes to decompress and parse the dumps
+                      with, one dump at a time each, or 0 to read them one
+                      after another in this process. With more than one,
+                      the pages of different dumps are mixed together.
+    :returns: A generator of Pages.
+    """
+    for res in _parsed(paths, processes, True):
+        p = api._page_from(res, _page_fields)
+        if p is not None:
+            yield p
+
+
+def revisions(api, paths, processes=0):
+    """Yield every revision in the XML dumps at *paths*, as Revisions,
+    without querying the API.
+
+    The revid, parent revision, timestamp, user, summary, whether the edit
+    was minor, and the content are loaded from the dump, unless they were
+    deleted. The :attr:`~ceterach.revision.Revision.page` of each Revision
+    has its title, pageid, namespace and whether it's a redirect loaded
+    as well.
+
+    :type api: :class:`ceterach.api.MediaWiki`
+    :param api: The wiki that the dumps are from.
+    :type paths: str or iterable
+    :param paths: The path to a dump, or an iterable of them. See
+                  :func:`parse`.
+    :type processes: int
+    :param processes: See :func:`pages`.
+    :returns: A generator of Revisions.
+    """
+    page = None
+    for res in _parsed(paths, processes, False):
+        if page is None or page.pageid != res['pageid']:
+            info = dict(res)
+            del info['revisions']
+            page = api._page_from(info, Page._info_fields)
+        for rev in api._revisions_from(res, _revision_fields):
+            rev._page = page
+            yield rev
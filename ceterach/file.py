@@ -22,7 +22,7 @@ import re
 
 from .page import Page
 from . import exceptions as exc
-from .utils import blah_decorate
+from .utils import lazy
 
 __all__ = ["File"]
 
@@ -30,17 +30,28 @@ def decorate(meth):
     msg = "File {0!r} does not exist"
     attr = "title"
     err = exc.NonexistentPageError
-    return blah_decorate(meth, msg, attr, err)
+    return lazy(meth, msg, attr, err)
 
 class File(Page):
 
+    __slots__ = ("_url", "_mime", "_hash", "_size", "_uploader", "_dimensions")
+
+    _iiprop = 'size', 'mime', 'sha1', 'url', 'user'
+    _field_params = dict(Page._field_params, **dict.fromkeys(
+        ("url", "mime", "hash", "size", "dimensions", "uploader"),
+        {"prop": ("imageinfo",), "iiprop": _iiprop}
+    ))
+
+    def _load_params(self):
+        params = super()._load_params()
+        if self._fields is None:
+            params['prop'] += ('imageinfo',)
+            params['iiprop'] = self._iiprop
+        return params
+
     def load_attributes(self, res=None):
         i = self._api.iterator
-        prop = 'info', 'revisions', 'categories', 'imageinfo'
-        rvprop = 'user', 'content'
-        iiprop = 'size', 'mime', 'sha1', 'url', 'user'
-        res = res or next(i(use_defaults=False,
-                            prop=prop, iiprop=iiprop, rvprop=rvprop,
+        res = res or next(i(self._load_params(), use_defaults=False,
                             rvlimit=1, rvdir="older", titles=self._title))
         super().load_attributes(res=res)
         try:
@@ -83,6 +94,7 @@ class File(Page):
         if key:
             post_params['sessionkey'] = key
         res = self._api.call(post_params)
+        self._invalidate()
         if 'upload' in res and res['upload']['result'] == "Success":
             # Some attributes are now out of date
             del self._dimensions, self._uploader, self._hash
@@ -119,31 +131,26 @@ class File(Page):
             url += "/" + str(width) + "px-" + t
         return url
 
-    @property
     @decorate
     def mime(self) -> str:
         """The mime type of the file."""
         return "_mime"
 
-    @property
     @decorate
     def hash(self) -> str:
         """The SHA1 hash of the file content."""
         return "_hash"
 
-    @property
     @decorate
     def size(self) -> int:
         """The file size in bytes."""
         return "_size"
 
-    @property
     @decorate
     def dimensions(self) -> tuple:
         """A tuple of integers, in the format of ``(width, height)``."""
         return "_dimensions"
 
-    @property
     @decorate
     def uploader(self):
         """
@@ -18,13 +18,12 @@
 # ------------------------------------------------------------------------------
 
 import re
-from hashlib import md5
 from datetime import datetime
 from time import strftime, gmtime
 
 from . import exceptions as exc
 from .revision import Revision
-from .utils import isostrptime, blah_decorate
+from .utils import isostrptime, lazy, load_lazily, check_fields, field_params
 
 __all__ = ["Page"]
 
@@ -33,7 +32,7 @@ def decorate(meth):
     msg = "Page {0!r} does not exist"
     attr = "title"
     err = exc.NonexistentPageError
-    return blah_decorate(meth, msg, attr, err)
+    return lazy(meth, msg, attr, err)
 
 
 class Page:
@@ -41,7 +40,29 @@ class Page:
     of getting information about the page.
     """
 
-    def __init__(self, api, title='', pageid=0, follow_redirects=False):
+    __slots__ = (
+        "_api", "_title", "_pageid", "follow_redirects", "_fields",
+        "_is_redirect", "_exists", "_content", "_namespace", "_is_talkpage",
+        "_protection", "_revision_user", "_revid", "_revisions",
+        "_categories", "_redirect_target", "__weakref__",
+    )
+    __getattr__ = load_lazily
+
+    #: The fields that ``prop=info`` loads, which every load asks for.
+    _info_fields = (
+        "title", "pageid", "exists", "namespace", "is_talkpage",
+        "is_redirect", "revid",
+    )
+    #: The query parameters that each of the other fields needs.
+    _field_params = {
+        "content": {"prop": ("revisions",), "rvprop": ("ids", "content")},
+        "revision_user": {"prop": ("revisions",), "rvprop": ("ids", "user")},
+        "protection": {"inprop": ("protection",)},
+        "categories": {"prop": ("categories",), "cllimit": "max"},
+    }
+
+    def __init__(self, api, title='', pageid=0, follow_redirects=False,
+                 fields=None):
         self._api = api
         if pageid is 0 and title is '':
             err = "You must specify either the 'title' or 'pageid' parameters"
@@ -52,6 +73,7 @@ class Page:
         self._title = title
         self._pageid = pageid
         self.follow_redirects = follow_redirects
+        self._fields = check_fields(self, fields)
 
     def __repr__(self):
         cls_name = type(self).__name__
@@ -82,6 +104,11 @@ class Page:
         for k, v in l:
             if v: return {k: v}
 
+    def _invalidate(self, *titles):
+        """Forget the cached results about this page, which may only be
+        known by its pageid, and about *titles*."""
+        self._api._invalidate(self._title, self._pageid, *titles)
+
     def load_attributes(self, res=None):
         """Call this to load ``self.__title``, ``._is_redirect``, ``._pageid``,
         ``._exists``, ``._namespace``, ``._creator``, and ``._revid``.
@@ -103,29 +130,53 @@ class Page:
                     'prop': ('info', 'revisions', 'categories'),
                     'rvprop': ('user', 'content')}``
 
+        If the Page was created with *fields*, only those fields are loaded
+        the first time, and anything else is loaded in full when it is
+        first needed.
         """
         self.__load(res)
         if self.follow_redirects and self.is_redirect:
             self._title = self.get_redirect_target().title
             del self._content
             self.__load(None)
+        self._fields = None
+
+    def _load_params(self):
+        """Return the query parameters that :meth:`load_attributes` needs,
+        without the page's title or pageid.
+        """
+        if self._fields is None:
+            return {
+                "prop": ('info', 'revisions', 'categories'),
+                "inprop": ("protection",),
+                "rvprop": ('ids', 'flags', 'timestamp', 'user', 'comment', 'content'),
+                "cllimit": "max",
+            }
+        fields = set(self._fields)
+        if self.follow_redirects:
+            # The content is what says where a redirect goes
+            fields.add("content")
+        return field_params(self, fields, {"prop": ("info",)})
+
+    def _wants(self, field):
+        """Whether the next load is supposed to load *field*."""
+        return self._fields is None or field in self._fields
 
     def __load(self, res):
         i = self._api.iterator
-        prop = ('info', 'revisions', 'categories')
-        inprop = ("protection",)
-        rvprop = ('ids', 'flags', 'timestamp', 'user', 'comment', 'content')
-        kwargs = {
-            "prop": prop, "rvprop": rvprop, "inprop": inprop,
-            "rvlimit": 1, "rvdir": "older"
-        }
+        kwargs = self._load_params()
+        kwargs.update(rvlimit=1, rvdir="older")
         if self.title != '':
             kwargs['titles'] = self.title
         elif self.pageid != 0:
             kwargs['pageids'] = self.pageid
         else:
             raise exc.CeterachError("WTF")
-        res = res or next(i(kwargs, use_defaults=False))
+        if not res:
+            stored = self._api._use_store(kwargs)
+            res = next(i(kwargs, use_defaults=False))
+            if stored:
+                self._api._fill_content(res.get('revisions', ()))
         # Normalise the page title in case it was entered oddly
         self._title = res['title']
         self._is_redirect = 'redirect' in res
@@ -146,28 +197,30 @@ class Page:
                 self._content = res['revisions'][0]["*"]
         self._namespace = res["ns"]
         self._is_talkpage = self._namespace % 2 == 1  # talkpages have odd IDs
-        self._protection = {
-            "edit": (None, None),
-            "move": (None, None),
-            "create": (None, None),
-        }
-        for info in res.get("protection", ''):
-            expiry = info['expiry']
-            if expiry == 'infinity':
-                expiry = getattr(datetime, 'max')
-            else:
-                expiry = isostrptime(expiry)
-            self._protection[info['type']] = info['level'], expiry
+        if self._wants("protection"):
+            self._protection = {
+                "edit": (None, None),
+                "move": (None, None),
+                "create": (None, None),
+            }
+            for info in res.get("protection", ''):
+                expiry = info['expiry']
+                if expiry == 'infinity':
+                    expiry = getattr(datetime, 'max')
+                else:
+                    expiry = isostrptime(expiry)
+                self._protection[info['type']] = info['level'], expiry
         # These last three fields will only be specified if the page exists:
-        try:
-            self._revision_user = self._api.user(res['revisions'][0]['user'])
+        revisions = res.get('revisions', ())
+        if revisions and 'user' in revisions[0]:
+            self._revision_user = self._api.user(revisions[0]['user'])
+        if 'lastrevid' in res:
             self._revid = res['lastrevid']
             self._revisions = []
-        except KeyError:
-            pass
-        c = self._api.category
-        cats = res.get("categories", "")
-        self._categories = tuple(c(x['title']) for x in cats)
+        if self._wants("categories"):
+            c = self._api.category
+            cats = res.get("categories", "")
+            self._categories = tuple(c(x['title']) for x in cats)
 
     def __edit(self, content, summary, minor, bot, force, edittype):
         ident_s = self.identity()
@@ -189,9 +242,15 @@ class Page:
             edit_params['minor'] = edit_params.pop("notminor")
         if bot:
             edit_params['bot'] = 1
+        # Edits that wouldn't change anything aren't sent, but they're
+        # reported like MediaWiki reports them
+        nochange = edittype in {'append', 'prepend'} and not content
         if force is False:
-            detect_ec = dict(prop="revisions", rvprop="timestamp", **ident_s)
-            ec_timestamp_res = next(self._api.iterator(detect_ec))
+            detect_ec = dict(prop="revisions", rvprop=("timestamp", "sha1"),
+                             **ident_s)
+            # A cached revision would hide edits made since then
+            ec_timestamp_res = next(self._api.iterator(detect_ec,
+                                                       use_cache=False))
             if 'missing' in ec_timestamp_res and edittype != 'create':
                 err = "Use the 'create' method to create pages"
                 raise exc.NonexistentPageError(err)
@@ -199,11 +258,17 @@ class Page:
                 err = "Invalid page titles can't be edited"
                 raise exc.InvalidPageError(err)
             if edittype != 'create':
-                ec_timestamp = ec_timestamp_res['revisions'][0]['timestamp']
-                edit_params['basetimestamp'] = ec_timestamp
+                ec_revision = ec_timestamp_res['revisions'][0]
+                edit_params['basetimestamp'] = ec_revision['timestamp']
                 edit_params['starttimestamp'] = strftime("%Y-%m-%dT%H:%M:%SZ", gmtime())
             # Add a checksum to ensure that the text is not corrupted
+            from hashlib import md5, sha1
             edit_params['md5'] = md5(content.encode("utf-8")).hexdigest()
+            if edittype == 'standard':
+                # The sha1 of the current text is already here, so there's
+                # no need to download the text to see if it's the same
+                current = ec_revision.get('sha1')
+                nochange = current == sha1(content.encode("utf-8")).hexdigest()
         if edittype == 'append':
             edit_params['appendtext'] = edit_params.pop("text")
         elif edittype == 'prepend':
@@ -211,7 +276,12 @@ class Page:
         elif edittype == 'create':
             edit_params['createonly'] = edit_params.pop("nocreate")
         try:
-            res = self._api.call(edit_params)
+            if nochange:
+                res = {"edit": {"result": "Success", "title": self.title,
+                                "nochange": ""}}
+            else:
+                res = self._api.call(edit_params)
+                self._invalidate(res.get('edit', {}).get('title'))
         except exc.CeterachError as e:
             # Make the exception more specific
             code = e.code.replace("-anon", "")
@@ -230,12 +300,13 @@ class Page:
         if res['edit']['result'] == "Success":
             # Some attributes are now out of date
             # unless it was a nochange
-            try:
-                del self._content
+            if 'newrevid' in res['edit']:
                 self._revid = res['edit']['newrevid']
-            except (AttributeError, KeyError):
-                pass
-            self._exists = True
+                self._exists = True
+                try:
+                    del self._content
+                except AttributeError:
+                    pass
             self._title = res['edit']['title']  # Normalise the title again
         elif res['edit']['result'] == "Failure":
             for reason in res['edit'].keys() - {"result"}:
@@ -258,6 +329,12 @@ class Page:
         Set *force* to True in order to make the edit in spite of edit
         conflicts and nonexistence.
 
+        Unless *force* is True, the edit isn't sent if *content* is the same
+        as the page's current content, which is checked against the SHA-1
+        that MediaWiki gives along with the timestamp that edit conflicts
+        are detected with. The result then has ``'nochange'`` in it, like
+        MediaWiki's result for such an edit would.
+
         :type content: str
         :param content: The text with which to replace the page's original
                         content.
@@ -311,6 +388,9 @@ class Page:
         Set *force* to True in order to make the edit in spite of edit
         conflicts or nonexistence.
 
+        If *content* is empty, the edit isn't sent, since it wouldn't change
+        anything, and the result has ``'nochange'`` in it.
+
         :type content: str
         :param content: The text with which to append to the page's original
                         content.
@@ -338,6 +418,9 @@ class Page:
         Set *force* to True in order to make the edit in spite of edit
         conflicts or nonexistence.
 
+        If *content* is empty, the edit isn't sent, since it wouldn't change
+        anything, and the result has ``'nochange'`` in it.
+
         :type content: str
         :param content: The text with which to prepend to the page's original
                         content.
@@ -385,7 +468,10 @@ class Page:
         }
         move_params = {k: v for (k, v) in move_params.items() if v}
         #allowed = ("movetalk", "movesubpages", "noredirect", "watch", "unwatch")
-        return self._api.call(move_params)
+        res = self._api.call(move_params)
+        moved = res.get('move', {})
+        self._invalidate(target, moved.get('from'), moved.get('to'))
+        return res
 
     def delete(self, reason=""):
         """Delete the page.
@@ -403,7 +489,9 @@ class Page:
             self._api.set_token("csrf")
             token = self._api.tokens['csrf']
         stuff['token'] = token
-        return self._api.call(stuff)
+        res = self._api.call(stuff)
+        self._invalidate(res.get('delete', {}).get('title'))
+        return res
 
     def undelete(self, reason=""):
         """Undelete the page.
@@ -421,7 +509,9 @@ class Page:
             self._api.set_token("csrf")
             token = self._api.tokens['csrf']
         stuff['token'] = token
-        return self._api.call(stuff)
+        res = self._api.call(stuff)
+        self._invalidate(res.get('undelete', {}).get('title'))
+        return res
 
     def from_revid(self, revid):
         """Returns a Page object by extracting information from the given revid.
@@ -461,14 +551,73 @@ class Page:
             "rvstartid": self.revid,
         }
         kwargs.update(self.identity())
+        stored = self._api._use_store(kwargs)
         res = self._api.call(kwargs, use_defaults=False)
         revs = tuple(res['query']['pages'].values())[0]['revisions']
+        if stored:
+            self._api._fill_content(revs)
         for r in revs:
-            revision_obj = Revision(self._api, r['revid'])
+            revision_obj = self._api.revision(r['revid'])
             filler = {"pageid": self.pageid, 'revisions': (r,)}
             revision_obj.load_attributes(filler)
             self._revisions.append(revision_obj)
 
+    def iter_history(self, start=None, end=None, props=None, content=False):
+        """Iterate over the page's revisions, from newest to oldest,
+        following the continuation for as long as there are any.
+
+        Nothing is kept around, so this works for pages with any number of
+        revisions, unlike :meth:`load_revisions`.
+
+        :type start: str
+        :param start: The timestamp of the newest revision to yield, in
+                      ISO 8601 format (optional).
+        :type end: str
+        :param end: The timestamp of the oldest revision to yield, in
+                    ISO 8601 format (optional).
+        :type props: iterable
+        :param props: The ``rvprop`` values to load the Revisions with
+                      (default: ``('ids', 'flags', 'timestamp', 'user',
+                      'comment')``). Anything else is loaded when it is
+                      first needed.
+        :type content: bool
+        :param content: Whether to load the content of the Revisions too.
+                        It is downloaded in separate queries by revid, as
+                        many revisions at a time as possible. If False, each
+                        Revision's content is loaded when it is first needed;
+                        use :meth:`MediaWiki.batch` to load it in bulk then.
+        :returns: A generator of Revisions.
+        """
+        props = props or ('ids', 'flags', 'timestamp', 'user', 'comment')
+        rvprop = ('ids',) + tuple(p for p in props
+                                  if p not in ('ids', 'content'))
+        params = {
+            "prop": "revisions",
+            "rvprop": rvprop,
+            "rvlimit": "max",
+            "rvdir": "older",
+        }
+        if start is not None:
+            params['rvstart'] = start
+        if end is not None:
+            params['rvend'] = end
+        params.update(self.identity())
+        if content:
+            rvprop += ('content',)
+        fields = set(Revision._info_fields)
+        for (field, p) in Revision._field_params.items():
+            if set(p.get("rvprop", ("",))).issubset(rvprop):
+                fields.add(field)
+        for res in self._api.iterator(params, use_defaults=False):
+            revs = res.get('revisions', ())
+            if content:
+                self._api._fill_content(revs)
+            for r in revs:
+                revision_obj = self._api.revision(r['revid'], fields)
+                filler = {"pageid": res['pageid'], 'revisions': (r,)}
+                revision_obj.load_attributes(filler, content=content)
+                yield revision_obj
+
     def toggle_talk(self, follow_redirects=None):
         """Return a page with its namespace switched to or from the talk
         namespace.
@@ -522,7 +671,6 @@ class Page:
         """
         return self._pageid
 
-    @property
     @decorate
     def content(self) -> str:
         """Returns the page content, which is cached if you try to get this
@@ -535,7 +683,6 @@ class Page:
         """
         return "_content"
 
-    @property
     @decorate
     def exists(self) -> bool:
         """Check the existence of the page.
@@ -544,7 +691,6 @@ class Page:
         """
         return "_exists"
 
-    @property
     @decorate
     def is_talkpage(self) -> bool:
         """Check if this page is in a talk namespace.
@@ -553,7 +699,6 @@ class Page:
         """
         return "_is_talkpage"
 
-    @property
     @decorate
     def revision_user(self):
         """Returns the last user to edit the page.
@@ -589,7 +734,6 @@ class Page:
             return self._redirect_target
         raise exc.RedirectError("Could not determine redirect target")
 
-    @property
     @decorate
     def is_redirect(self) -> bool:
         """
@@ -598,7 +742,6 @@ class Page:
         """
         return "_is_redirect"
 
-    @property
     @decorate
     def namespace(self) -> int:
         """
@@ -606,7 +749,6 @@ class Page:
         """
         return "_namespace"
 
-    @property
     @decorate
     def protection(self) -> dict:
         """Get the protection levels on the page.
@@ -626,7 +768,6 @@ class Page:
         """
         return "_protection"
 
-    @property
     @decorate
     def revid(self) -> int:
         """
@@ -634,7 +775,6 @@ class Page:
         """
         return "_revid"
 
-    @property
     @decorate
     def categories(self) -> tuple:
         """A tuple containing the categories that the page can be found in."""
@@ -643,7 +783,7 @@ class Page:
     @property
     def revisions(self) -> tuple:
         """A tuple containing the page's revisions, from newest to oldest."""
-        return tuple(self._get_revs())
+        return tuple(self._get_revs)
 
     @decorate
     def _get_revs(self):
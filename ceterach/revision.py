@@ -20,21 +20,47 @@
 import datetime
 
 from . import exceptions as exc
-from .utils import isostrptime, blah_decorate
+from .utils import isostrptime, lazy, load_lazily, check_fields, field_params
 
 
-def decorate(meth):
+def decorate(meth, convert=None):
     msg = "Revision {0!r} does not exist"
     attr = 'revid'
     err = exc.NonexistentRevisionError
-    return blah_decorate(meth, msg, attr, err)
+    return lazy(meth, msg, attr, err, convert)
+
+
+def decorate_stamp(meth):
+    # The timestamp is only parsed if somebody reads it
+    return decorate(meth, isostrptime)
 
 
 class Revision:
 
-    def __init__(self, api, revid):
+    __slots__ = (
+        "_api", "_revid", "_fields", "_page", "_summary", "_timestamp",
+        "_raw_timestamp", "_user", "_is_minor", "_rvtoken", "_prev_revision",
+        "_content", "_is_deleted", "__weakref__",
+    )
+    __getattr__ = load_lazily
+
+    #: The fields that every load gets.
+    _info_fields = ("revid", "page", "prev_revision")
+    #: The query parameters that each of the other fields needs.
+    _field_params = {
+        "summary": {"rvprop": ("comment",)},
+        "timestamp": {"rvprop": ("timestamp",)},
+        "user": {"rvprop": ("user",)},
+        "is_minor": {"rvprop": ("flags",)},
+        "content": {"rvprop": ("content",)},
+        "is_deleted": {"rvprop": ("content",)},
+        "rvtoken": {"rvtoken": "rollback"},
+    }
+
+    def __init__(self, api, revid, fields=None):
         self._api = api
         self._revid = revid
+        self._fields = check_fields(self, fields)
 
     def __repr__(self):
         cls_name = type(self).__name__
@@ -49,40 +75,79 @@ class Revision:
         return getattr(other, '_api', None) != self._api or \
                getattr(other, 'revid', None) != self.revid
 
-    def load_attributes(self, res=None):
-        self.__load(res)
+    def _load_params(self):
+        """Return the query parameters that :meth:`load_attributes` needs,
+        without the revid.
+        """
+        if self._fields is None:
+            return {
+                "prop": "revisions",
+                "rvprop": ('ids', 'flags', 'timestamp', 'user', 'comment', 'content'),
+                "rvtoken": "rollback"
+            }
+        params = {"prop": "revisions", "rvprop": ('ids',)}
+        return field_params(self, self._fields, params)
+
+    def _wants(self, field):
+        """Whether the next load is supposed to load *field*."""
+        return self._fields is None or field in self._fields
+
+    def load_attributes(self, res=None, content=True):
+        """Call this to load the revision's attributes.
+
+        If the *res* parameter was supplied, the method will pretend that
+        was what the query returned.
+
+        :type res: dict
+        :param res: The result of an earlier API request (optional), in the
+                    form ``{"pageid": ..., "revisions": (revision,)}``.
+        :type content: bool
+        :param content: Set this to False if *res* was requested without
+                        ``rvprop=content``. The content, and whether the
+                        revision is deleted, will then be loaded when they
+                        are first needed.
 
-    def __load(self, res):
+        If the Revision was created with *fields*, only those fields are
+        loaded the first time, and anything else is loaded in full when it
+        is first needed.
+        """
+        self.__load(res, content)
+        self._fields = None
+
+    def __load(self, res, content):
         i = self._api.iterator
-        rvprop = ('ids', 'flags', 'timestamp', 'user', 'comment', 'content')
-        kwargs = {
-            "revids": self._revid,
-            "prop": "revisions",
-            "rvprop": rvprop,
-            "rvtoken": "rollback"
-        }
-        res = res or next(i(kwargs, use_defaults=False))
+        kwargs = self._load_params()
+        kwargs['revids'] = self._revid
+        if not res:
+            stored = self._api._use_store(kwargs, [self._revid])
+            res = next(i(kwargs, use_defaults=False))
+            if stored:
+                self._api._fill_content(res['revisions'])
         self._page = self._api.page(res['pageid'])
         res = res['revisions'][0]
-        self._summary = res['comment']
-        self._timestamp = isostrptime(res['timestamp'])
-        self._user = self._api.user(res['user'])
-        self._is_minor = 'minor' in res
+        if 'comment' in res:
+            self._summary = res['comment']
+        if 'timestamp' in res:
+            self._raw_timestamp = res['timestamp']
+        if 'user' in res:
+            self._user = self._api.user(res['user'])
+        if self._wants("is_minor"):
+            self._is_minor = 'minor' in res
         try:
             self._rvtoken = res['rollbacktoken']
         except KeyError:
             pass
         if res['parentid']:
-            self._prev_revision = Revision(self._api, res['parentid'])
+            self._prev_revision = self._api.revision(res['parentid'])
         else:
             self._prev_revision = None
-        try:
+        if "*" in res:
             self._content = res["*"]
-        except KeyError:
+            self._is_deleted = False
+        elif content and (self._wants("content") or
+                          self._wants("is_deleted")):
             self._is_deleted = True
 #            self._is_deleted = 'texthidden' in res
-        else:
-            self._is_deleted = False
 
     def restore(self, summary="", minor=False, bot=True, force=False):
         """Replace the page's content with the content found in this revision.
@@ -134,7 +199,9 @@ class Revision:
             params['summary'] = summary
         if bot:
             params['markbot'] = 1
-        return self._api.call(params)
+        res = self._api.call(params)
+        self._api._invalidate(params['title'])
+        return res
 
 #    def delete(self):
 #        pass
@@ -142,18 +209,15 @@ class Revision:
 #    def undelete(self):
 #        pass
 
-    @property
     @decorate
     def revid(self) -> int:
         """The revision id of the revision."""
         return "_revid"
 
-    @property
     @decorate
     def rvtoken(self) -> str:
         return "_rvtoken"
 
-    @property
     @decorate
     def page(self):
         """The page to which this revision was made."""
@@ -161,19 +225,16 @@ class Revision:
         attr = "_page"
         return attr
 
-    @property
     @decorate
     def summary(self) -> str:
         """The edit summary that describes this revision."""
         return "_summary"
 
-    @property
-    @decorate
+    @decorate_stamp
     def timestamp(self)-> datetime.datetime:
         """The time at which this revision was made."""
         return "_timestamp"
 
-    @property
     @decorate
     def user(self):
         """The user who made this revision."""
@@ -181,13 +242,11 @@ class Revision:
         attr = "_user"
         return attr
 
-    @property
     @decorate
     def is_minor(self) -> bool:
         """True if this revision was a minor edit, otherwise False."""
         return "_is_minor"
 
-    @property
     @decorate
     def prev_revision(self):
         """The revision made before this one, which was made to the same
@@ -197,13 +256,11 @@ class Revision:
         attr = "_prev_revision"
         return attr
 
-    @property
     @decorate
     def content(self) -> str:
         """The content of the page described by this revision."""
         return "_content"
 
-    @property
     @decorate
     def is_deleted(self) -> bool:
         """True if the revision is deleted, otherwise False."""
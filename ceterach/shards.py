@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+from datetime import timedelta
+
+from .utils import isostrptime
+
+__all__ = ["title_shards", "time_shards", "pageid_shards"]
+
+_STAMP = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def title_shards(boundaries, prefix="ap"):
+    """Split a listing by title into the ranges between *boundaries*, for
+    :meth:`ceterach.api.MediaWiki.sharded_iterator`.
+
+    The API includes both ends of a range, so a page whose title is one of
+    the boundaries is listed by two shards; pass ``key=lambda r:
+    r['title']`` to the iterator to list it once.
+
+    :type boundaries: iterable
+    :param boundaries: Titles in the order that the API lists them, e.g.
+                       ``("F", "M", "S")``.
+    :type prefix: str
+    :param prefix: The prefix of the module's ``from`` and ``to`` parameters,
+                   e.g. ``"ap"`` for ``list=allpages``.
+    :returns: A list of parameter dicts, one per range, in order.
+    """
+    edges = [None] + list(boundaries) + [None]
+    shards = []
+    for (start, end) in zip(edges, edges[1:]):
+        shard = {}
+        if start is not None:
+            shard[prefix + "from"] = start
+        if end is not None:
+            shard[prefix + "to"] = end
+        shards.append(shard)
+    return shards
+
+
+def time_shards(oldest, newest, count, prefix="rc", newer=False):
+    """Split a listing by timestamp into *count* windows between *oldest*
+    and *newest*, for :meth:`ceterach.api.MediaWiki.sharded_iterator`.
+
+    Timestamps only go down to the second, so the windows don't overlap.
+
+    :param oldest: The start of the first window, as a datetime or an
+                   ISO 8601 timestamp.
+    :param newest: The end of the last window, likewise.
+    :type count: int
+    :param count: How many windows to make.
+    :type prefix: str
+    :param prefix: The prefix of the module's ``start``, ``end`` and ``dir``
+                   parameters, e.g. ``"rc"`` for ``list=recentchanges``.
+    :type newer: bool
+    :param newer: Whether the items should be listed from oldest to newest
+                  instead of the API's default of newest to oldest.
+    :returns: A list of parameter dicts, one per window, in the order that
+              their items will be listed in.
+    """
+    if isinstance(oldest, str):
+        oldest = isostrptime(oldest)
+    if isinstance(newest, str):
+        newest = isostrptime(newest)
+    span = int((newest - oldest).total_seconds())
+    cuts = [oldest + timedelta(seconds=span * k // count)
+            for k in range(count)]
+    cuts.append(newest + timedelta(seconds=1))
+    shards = []
+    second = timedelta(seconds=1)
+    for (low, high) in zip(cuts, cuts[1:]):
+        high -= second
+        if low > high:
+            continue
+        low, high = low.strftime(_STAMP), high.strftime(_STAMP)
+        if newer:
+            shard = {prefix + "start": low, prefix + "end": high,
+                     prefix + "dir": "newer"}
+        else:
+            shard = {prefix + "start": high, prefix + "end": low}
+        shards.append(shard)
+    return shards if newer else shards[::-1]
+
+
+def pageid_shards(start, stop, size=50):
+    """Split the pageids from *start* up to, but not including, *stop* into
+    ``pageids`` parameters of *size* pageids each, for
+    :meth:`ceterach.api.MediaWiki.sharded_iterator`.
+
+    :returns: A list of parameter dicts, one per range, in order.
+    """
+    return [{"pageids": list(range(low, min(low + size, stop)))}
+            for low in range(start, stop, size)]
@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import sqlite3
+import threading
+import zlib
+
+from .utils import chunks
+
+__all__ = ["ContentStore"]
+
+
+class ContentStore:
+    """Keeps the content of revisions in an SQLite database at *path*,
+    compressed with zlib at *level*.
+
+    The content of a revision never changes once it has a revid, so there's
+    no need to download it more than once. Pass one of these to
+    :class:`ceterach.api.MediaWiki` as the *store* config key, and Pages and
+    Revisions will look in it before asking the wiki for content, and save
+    whatever content they had to download. The database can be reused
+    between runs, and shared between threads.
+    """
+
+    def __init__(self, path, level=6):
+        self.path = path
+        self.level = level
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS content "
+                             "(revid INTEGER PRIMARY KEY, text BLOB NOT NULL)")
+
+    def __repr__(self):
+        cls_name = type(self).__name__
+        text = "{c}(path={self.path!r}, level={self.level!r})"
+        return text.format(c=cls_name, self=self)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM content").fetchone()[0]
+
+    def __contains__(self, revid):
+        return self.get(revid) is not None
+
+    def get(self, revid):
+        """Returns the content of *revid*, or None if it isn't stored."""
+        return self.get_many((revid,)).get(revid)
+
+    def get_many(self, revids) -> dict:
+        """Returns a dict that maps each of *revids* that is stored to its
+        content."""
+        found = {}
+        # SQLite won't take more than 999 parameters at once
+        for chunk in chunks(revids, 500):
+            sql = "SELECT revid, text FROM content WHERE revid IN ({0})"
+            sql = sql.format(",".join("?" * len(chunk)))
+            with self._lock:
+                rows = self._db.execute(sql, chunk).fetchall()
+            for (revid, text) in rows:
+                found[revid] = zlib.decompress(text).decode("utf-8")
+        return found
+
+    def put(self, revid, content):
+        """Store *content* as the content of *revid*."""
+        self.put_many(((revid, content),))
+
+    def put_many(self, items):
+        """Store each ``(revid, content)`` in *items*."""
+        rows = [(revid, zlib.compress(content.encode("utf-8"), self.level))
+                for (revid, content) in items]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO content "
+                                 "(revid, text) VALUES (?, ?)", rows)
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
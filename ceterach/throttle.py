@@ -0,0 +1,265 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import threading
+from time import monotonic, sleep, time
+
+__all__ = ["TokenBucket", "AdaptiveLimiter"]
+
+INF = float("inf")
+
+
+class TokenBucket:
+    """Limits how often something can happen, while allowing short bursts.
+
+    The bucket holds up to *burst* tokens, and refills at *rate* tokens per
+    second. Each request takes a token, and if there aren't any left, it has
+    to wait until one is due. A *rate* of 0 means there is no limit.
+
+    Token buckets are thread-safe, and waiting for one doesn't stop other
+    threads from reserving theirs.
+    """
+
+    def __init__(self, rate=0, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        cls_name = type(self).__name__
+        text = "{c}(rate={self.rate!r}, burst={self.burst!r})"
+        return text.format(c=cls_name, self=self)
+
+    def reserve(self):
+        """Take a token.
+
+        :returns: How many seconds to wait before the token can be used.
+        """
+        with self._lock:
+            now = monotonic()
+            if not self.rate:
+                self._tokens, self._last = self.burst, now
+                return 0
+            elapsed = now - self._last
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last = now
+            # Going into debt is how waiting threads queue up behind each other
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Take a token, and wait until it can be used.
+
+        :returns: How many seconds were spent waiting.
+        """
+        delay = self.reserve()
+        if delay:
+            sleep(delay)
+        return delay
+
+
+class AdaptiveLimiter:
+    """Paces requests and limits how many can be in flight at once, backing
+    off when the wiki says that its database replicas are lagging and
+    creeping back up while they aren't.
+
+    This is additive-increase/multiplicative-decrease (AIMD) congestion
+    control, like TCP's: every successful request adds :attr:`increase`
+    requests per second to the rate and about one request per round to the
+    concurrency, and every ``maxlag`` error multiplies both by
+    :attr:`decrease` and pauses all requests for a while. Several errors in
+    a row only count once, until the pause is over.
+
+    *rate* (requests per second), *burst*, and *concurrency* are the
+    ceilings, and 0 means that there is no ceiling. The current values, and
+    the last lag the wiki reported, are in :attr:`state`.
+    """
+
+    #: Requests per second added to the rate after each success
+    increase = 0.5
+    #: What the rate and concurrency are multiplied by after a maxlag error
+    decrease = 0.5
+    #: The rate never goes below this many requests per second
+    min_rate = 0.1
+
+    def __init__(self, rate=0, burst=1, concurrency=0):
+        self._bucket = TokenBucket(rate, burst)
+        self._cond = threading.Condition()
+        self.max_rate = rate
+        self.max_concurrency = concurrency
+        self.rate = rate or INF
+        self.concurrency = concurrency or INF
+        self.in_flight = 0
+        self.lag = None
+        self.lagged_at = None
+        self._peak = 0
+        self._interval = None
+        self._last_start = None
+        self._resume_at = 0
+
+    def __repr__(self):
+        cls_name = type(self).__name__
+        text = "{c}(rate={self.max_rate!r}, burst={self._bucket.burst!r}, " \
+               "concurrency={self.max_concurrency!r})"
+        return text.format(c=cls_name, self=self)
+
+    @property
+    def burst(self) -> int:
+        """How many requests can be sent at once after a quiet spell."""
+        return self._bucket.burst
+
+    @property
+    def state(self) -> dict:
+        """A snapshot of the limiter, with the keys:
+
+        - *rate*, the current requests per second (``inf`` if unlimited).
+        - *concurrency*, the current number of requests allowed in flight
+          (``inf`` if unlimited).
+        - *in_flight*, the number of requests in flight.
+        - *lag*, the last lag in seconds reported by the wiki, or None.
+        - *lagged_at*, the Unix time that it was reported, or None.
+        """
+        with self._cond:
+            return {
+                "rate": self.rate, "concurrency": self.concurrency,
+                "in_flight": self.in_flight, "lag": self.lag,
+                "lagged_at": self.lagged_at,
+            }
+
+    def configure(self, rate, burst, concurrency):
+        """Change the ceilings, keeping the current values under them."""
+        with self._cond:
+            self.max_rate = rate
+            self.max_concurrency = concurrency
+            self.rate = min(self.rate, rate or INF)
+            self.concurrency = min(self.concurrency, concurrency or INF)
+            self._bucket.burst = burst
+            self._update_bucket()
+
+    def _update_bucket(self):
+        self._bucket.rate = 0 if self.rate == INF else self.rate
+
+    def _limit(self):
+        if self.concurrency == INF:
+            return INF
+        return max(1, int(self.concurrency))
+
+    def reserve(self):
+        """Take a turn to send a request.
+
+        :returns: How many seconds to wait before sending it.
+        """
+        with self._cond:
+            now = monotonic()
+            if self._last_start is not None:
+                gap = now - self._last_start
+                if self._interval is None:
+                    self._interval = gap
+                else:
+                    self._interval = 0.8 * self._interval + 0.2 * gap
+            self._last_start = now
+            pause = self._resume_at - now
+        return max(pause, self._bucket.reserve(), 0)
+
+    def try_enter(self):
+        """Count a request as in flight, unless there are already too many.
+
+        :returns: True if the request can be sent.
+        """
+        with self._cond:
+            if self.in_flight >= self._limit():
+                return False
+            self.in_flight += 1
+            self._peak = max(self._peak, self.in_flight)
+            return True
+
+    def enter(self):
+        """Wait until a request can be in flight, and count it."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_flight < self._limit())
+            self.in_flight += 1
+            self._peak = max(self._peak, self.in_flight)
+
+    def release(self):
+        """Count a request as no longer in flight."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def acquire(self):
+        """Wait for a turn to send a request, and count it as in flight.
+        Call :meth:`release` once it's finished.
+        """
+        delay = self.reserve()
+        if delay:
+            sleep(delay)
+        self.enter()
+
+    def succeeded(self):
+        """Record a request that went through."""
+        with self._cond:
+            if self.rate != INF:
+                self.rate += self.increase
+                if self.max_rate:
+                    self.rate = min(self.rate, self.max_rate)
+                elif self._interval and self.rate > 2 / self._interval:
+                    # Requests aren't being held back anymore
+                    self.rate = INF
+            if self.concurrency != INF:
+                self.concurrency += 1 / self.concurrency
+                if self.max_concurrency:
+                    self.concurrency = min(self.concurrency,
+                                           self.max_concurrency)
+                elif self.concurrency > 2 * max(self._peak, 1):
+                    self.concurrency = INF
+            self._update_bucket()
+            self._cond.notify_all()
+
+    def lagged(self, lag, wait):
+        """Record a request that failed because the replicas are lagging.
+
+        :type lag: float
+        :param lag: How many seconds the replicas are lagging by, or None if
+                    the wiki didn't say.
+        :type wait: float
+        :param wait: How many seconds to pause all requests for.
+        """
+        with self._cond:
+            now = monotonic()
+            self.lag, self.lagged_at = lag, time()
+            if now >= self._resume_at:
+                if self._interval:
+                    observed = 1 / self._interval
+                else:
+                    observed = self.rate
+                rate = min(self.rate, observed)
+                if rate == INF:
+                    rate = 1
+                self.rate = max(self.min_rate, rate * self.decrease)
+                concurrency = self.concurrency
+                if concurrency == INF:
+                    concurrency = max(self._peak, 1)
+                self.concurrency = max(1, concurrency * self.decrease)
+                self._peak = self.in_flight
+                self._update_bucket()
+            self._resume_at = max(self._resume_at, now + wait)
@@ -0,0 +1,215 @@
+#!/usr/bin/python3
+# ------------------------------------------------------------------------------
+# This file is part of Ceterach.
+# Copyright (C) 2013 Riamse <riamse@protonmail.com>
+#
+# Ceterach is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# Ceterach is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import collections
+import json
+import threading
+import time
+
+from . import exceptions as exc
+
+__all__ = ["Transport", "RequestsTransport", "Recording", "Replay"]
+
+#: Parameters that aren't written down, or compared when replaying.
+_unrecorded = frozenset(("lgpassword", "password", "retype", "file",
+                         "token", "lgtoken"))
+#: Headers that aren't written down.
+_unrecorded_headers = frozenset(("Set-Cookie",))
+#: Parameters that change every time a bot runs, which aren't compared when
+#: replaying by default.
+_volatile = frozenset(("starttimestamp",))
+#: What tokens and session ids in the results are written down as, which is
+#: the token that MediaWiki gives to logged out users.
+_PLACEHOLDER = "+\\"
+
+
+def _key(url, params, is_get, ignore=frozenset()):
+    params = {k: str(v) for (k, v) in params.items()
+              if k not in _unrecorded and k not in ignore}
+    return json.dumps([url, is_get, params], sort_keys=True)
+
+
+def _scrubbed(result):
+    """Returns a copy of *result* without the tokens and session ids that
+    logging in and asking for tokens give out."""
+    if isinstance(result, dict):
+        return {k: _PLACEHOLDER if k.endswith("token") or k == "sessionid"
+                else _scrubbed(v) for (k, v) in result.items()}
+    if isinstance(result, list):
+        return [_scrubbed(v) for v in result]
+    return result
+
+
+def _header(name):
+    # So that "retry-after" can be found as "Retry-After" when it's replayed
+    return "-".join(word.capitalize() for word in name.split("-"))
+
+
+class Transport:
+    """The way that a :class:`ceterach.api.MediaWiki` sends its queries.
+
+    Pass one of these to it as the *transport* config key. Otherwise,
+    queries are sent with a :class:`RequestsTransport`.
+    """
+
+    def request(self, url, params, is_get):
+        """Send *params* to the API at *url*, with GET if *is_get* is True,
+        otherwise with POST.
+
+        :returns: ``(result, headers)``, where *result* is the decoded JSON,
+                  or None if the response wasn't JSON.
+        :raises: :class:`ceterach.exceptions.ApiError` if the API could not
+                 be reached.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Let go of whatever the transport has open."""
+
+
+class RequestsTransport(Transport):
+    """Sends queries over the network with a ``requests.Session``, which is
+    made if *session* is None."""
+
+    def __init__(self, session=None):
+        if session is None:
+            import requests
+            from .api import USER_AGENT
+            session = requests.Session()
+            session.headers.update({"User-Agent": USER_AGENT})
+        self.session = session
+
+    def request(self, url, params, is_get):
+        import requests
+        urlopen = self.session.get if is_get else self.session.post
+        try:
+            res = urlopen(url, **{"params" if is_get else "data": params})
+        except (requests.HTTPError, requests.ConnectionError) as e:
+            raise exc.ApiError(e)
+        try:
+            return res.json(), res.headers
+        except ValueError:
+            return None, res.headers
+
+    def close(self):
+        self.session.close()
+
+
+class Recording(Transport):
+    """Sends queries with *transport*, a :class:`RequestsTransport` if it's
+    None, and appends each of them, and what came back, to the file at
+    *path*, for :class:`Replay` to send back later: ::
+
+        >>> api = MediaWiki(url, {"transport": Recording("bot.jsonl")})
+        >>> run_the_bot(api)
+        >>> api = MediaWiki(url, {"transport": Replay("bot.jsonl")})
+        >>> run_the_bot(api)  # Same results, without the network
+
+    Each line of the file is a JSON object. Passwords, uploaded files,
+    cookies, and tokens aren't written down, so neither is anything that
+    would let someone else use the bot's session. The tokens in the
+    results are replaced with the one that MediaWiki gives to logged out
+    users.
+    """
+
+    def __init__(self, path, transport=None):
+        self.transport = transport or RequestsTransport()
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def request(self, url, params, is_get):
+        record = {
+            "url": url, "get": is_get,
+            "params": {k: str(v) for (k, v) in params.items()
+                       if k not in _unrecorded},
+        }
+        before = time.monotonic()
+        try:
+            result, headers = self.transport.request(url, params, is_get)
+        except exc.ApiError as e:
+            record['error'] = str(e)
+            raise
+        else:
+            record['result'] = _scrubbed(result)
+            record['headers'] = {_header(k): v for (k, v) in headers.items()
+                                 if _header(k) not in _unrecorded_headers}
+            return result, headers
+        finally:
+            record['elapsed'] = time.monotonic() - before
+            line = json.dumps(record, sort_keys=True)
+            with self._lock:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        self.transport.close()
+
+
+class Replay(Transport):
+    """Answers queries with what a :class:`Recording` wrote down in the file
+    at *path*, without the network.
+
+    Queries are matched by their URL, method and parameters, except for
+    the ones in *ignore*. If the same
+    query was recorded more than once, like a query that was retried after
+    a maxlag error, the responses are given back in the order they were
+    recorded, and the last one is repeated after that. A query that wasn't
+    recorded raises :class:`ceterach.exceptions.ApiError`, like a network
+    failure would.
+
+    :type latency: float
+    :param latency: How many seconds to wait before answering each query,
+                    or None to take as long as the query did when it was
+                    recorded.
+    :type ignore: iterable
+    :param ignore: The parameters that aren't compared, because they're
+                   different every time the bot runs (default:
+                   ``("starttimestamp",)``, which :meth:`Page.edit
+                   <ceterach.page.Page.edit>` sets to the current time).
+    """
+
+    def __init__(self, path, latency=0, ignore=_volatile):
+        self.latency = latency
+        self.ignore = frozenset(ignore)
+        self._responses = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    key = _key(record['url'], record['params'],
+                               record['get'], self.ignore)
+                    self._responses[key].append(record)
+
+    def request(self, url, params, is_get):
+        key = _key(url, params, is_get, self.ignore)
+        with self._lock:
+            records = self._responses.get(key)
+            if not records:
+                err = "No response to {0} was recorded"
+                raise exc.ApiError(err.format(key))
+            record = records.popleft() if len(records) > 1 else records[0]
+        wait = record['elapsed'] if self.latency is None else self.latency
+        if wait:
+            time.sleep(wait)
+        if 'error' in record:
+            raise exc.ApiError(record['error'])
+        return record['result'], record['headers']
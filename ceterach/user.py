@@ -28,19 +28,32 @@ except ImportError:
     # Also, this provides support for Python 3.2
     from .utils import ip_address
 from . import exceptions as exc
-from .utils import isostrptime, blah_decorate
+from .utils import isostrptime, lazy, load_lazily
 
 __all__ = ['User']
 
 
-def decorate(meth):
+def decorate(meth, convert=None):
     msg = "User {0!r} does not exist"
     attr = "name"
     err = exc.NonexistentUserError
-    return blah_decorate(meth, msg, attr, err)
+    return lazy(meth, msg, attr, err, convert)
+
+
+def decorate_stamp(meth):
+    # The timestamp is only parsed if somebody reads it
+    return decorate(meth, isostrptime)
 
 
 class User:
+
+    __slots__ = (
+        "_api", "_name", "_is_ip", "_userpage", "_exists", "_userid",
+        "_gender", "_rights", "_blockinfo", "_groups", "_editcount",
+        "_registration", "_raw_registration", "_emailable", "__weakref__",
+    )
+    __getattr__ = load_lazily
+
     def __init__(self, api, name):
         self._api = api
         self._name = name
@@ -58,6 +71,16 @@ class User:
         return getattr(other, '_api', None) != self._api or \
                getattr(other, 'name', None) != self.name
 
+    def _load_params(self):
+        """Return the query parameters that :meth:`load_attributes` needs,
+        without the username.
+        """
+        props = (
+            "blockinfo", "groups", "rights", "editcount",
+            "registration", "emailable", "gender",
+        )
+        return {"action": "query", "list": "users", "usprop": props}
+
     def load_attributes(self, res=None):
         """Call this to load ``self.__title``, ``._is_redirect``, ``._pageid``,
         ``._exists``, ``._namespace``, ``._creator``, and ``._revid``.
@@ -84,14 +107,8 @@ class User:
             self._is_ip = bool(ip_address(self.name))
         except ValueError:
             pass
-        props = (
-            "blockinfo", "groups", "rights", "editcount",
-            "registration", "emailable", "gender",
-        )
-        res = res or self._api.call(use_defaults=False,
-                                    action="query", list="users",
-                                    ususers=self._name,
-                                    usprop=props)['query']['users'][0]
+        res = res or self._api.call(self._load_params(), use_defaults=False,
+                                    ususers=self._name)['query']['users'][0]
         # normalize our username in case it was entered oddly
         self._name = res['name']
         self._userpage = self._api.page("User:" + self.name)
@@ -123,12 +140,12 @@ class User:
         self._groups = tuple(res.get("groups", ""))
         self._editcount = res.get("editcount", 0)
         reg = res.get("registration", None)  # For IP addresses
-        try:
-            self._registration = isostrptime(reg)
-        except TypeError:
+        if reg is None:
             # Sometimes the API doesn't give a date; the user's probably really
             # old. There's nothing else we can do!
             self._registration = datetime.min
+        else:
+            self._raw_registration = reg
         self._emailable = 'emailable' in res
 
     def email(self, subject, text, cc=True):
@@ -183,19 +200,16 @@ class User:
         raise NotImplementedError
         # return self._api.create_account(self.name, password, email, realname, logout)
 
-    @property
     @decorate
     def is_ip(self) -> bool:
         """Whether this user is an IP user."""
         return "_is_ip"
 
-    @property
     @decorate
     def name(self) -> str:
         """The displayed username or IP address of this user."""
         return "_name"
 
-    @property
     @decorate
     def userpage(self):
         """A Page object that represents this user's userpage."""
@@ -203,13 +217,11 @@ class User:
         attr = "_userpage"
         return attr
 
-    @property
     @decorate
     def userid(self) -> int:
         """This user's user id, for internal MediaWiki use."""
         return "_userid"
 
-    @property
     @decorate
     def blockinfo(self) -> dict:
         """Information on the user's current block status.
@@ -220,19 +232,16 @@ class User:
         """
         return "_blockinfo"
 
-    @property
     @decorate
     def editcount(self) -> int:
         """The number of edits this user has made."""
         return "_editcount"
 
-    @property
     @decorate
     def is_emailable(self) -> bool:
         """Whether this user can be emailed."""
         return "_emailable"
 
-    @property
     @decorate
     def rights(self) -> tuple:
         """The user rights that this user has. This is different from the
@@ -241,13 +250,11 @@ class User:
         """
         return "_rights"
 
-    @property
-    @decorate
+    @decorate_stamp
     def registration(self) -> datetime:
         """The time that this user registered at."""
         return "_registration"
 
-    @property
     @decorate
     def groups(self) -> list:
         """The user groups that this user is in. This is different from the
@@ -256,13 +263,11 @@ class User:
         """
         return "_groups"
 
-    @property
     @decorate
     def gender(self) -> str:
         """The gender of the user."""
         return "_gender"
 
-    @property
     @decorate
     def exists(self) -> bool:
         """Whether this user account exists."""
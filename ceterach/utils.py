@@ -17,12 +17,12 @@
 # along with Ceterach.  If not, see <http://www.gnu.org/licenses/>.
 # ------------------------------------------------------------------------------
 
-# Pretty sure we don't even need this file anymore, except for blah_decorate
 
 import re
-import functools
-
-from arrow import Arrow
+import queue
+import operator
+import itertools
+import threading
 
 # __all__ and friends are defined at the bottom
 
@@ -34,71 +34,220 @@ from arrow import Arrow
 #    return lambda the_func: wrapped
 
 
-def blah_decorate(meth, message, message_attr, error):
-    """I'm lazy"""
-    attr = meth(0) # The method should be returning the attribute to get
-    @functools.wraps(meth)
-    def wrapped(self):
-        if not hasattr(self, attr): self.load_attributes()
+class lazy(property):
+    """A read-only attribute whose value is kept in the slot that *meth*
+    returns the name of.
+
+    Reading a loaded value costs no more than reading the slot. If the slot
+    is empty, the class's ``__getattr__``, which should be
+    :func:`load_lazily`, calls :meth:`load`.
+
+    If *convert* is given, the loader can put a string in the slot named
+    ``"_raw"`` followed by the name of the attribute's own slot instead,
+    and ``convert(string)`` is moved into the attribute's slot the first
+    time the attribute is read. After that, reading it costs no more than
+    reading any other slot.
+    """
+
+    def __init__(self, meth, message, message_attr, error, convert=None):
+        self.slot = meth(0)  # The method should be returning the attribute to get
+        super().__init__(operator.attrgetter(self.slot), doc=meth.__doc__)
+        self.message = message
+        self.message_attr = message_attr
+        self.error = error
+        self.convert = convert
+        self.raw = None if convert is None else "_raw" + self.slot
+
+    def load(self, obj):
+        """Load the attribute of *obj* with ``obj.load_attributes()`` and
+        return it, or raise *error* with *message*, formatted with the
+        *message_attr* attribute of *obj*, if it still isn't there."""
+        if not self._converted(obj):
+            # Inside MediaWiki.batch(), load everything that's waiting at once
+            batch = getattr(obj._api, "_batch", None)
+            if batch is None or not batch.flush(obj, self.slot):
+                obj.load_attributes()
+            self._converted(obj)
+        try:
+            return self.fget(obj)
+        except AttributeError:
+            err = self.message.format(getattr(obj, self.message_attr))
+        raise self.error(err)
+
+    def _converted(self, obj):
+        """Converts the raw value of *obj*, if it has one, into the
+        attribute's slot, and returns whether it did."""
+        if self.raw is None:
+            return False
         try:
-            return getattr(self, attr)
+            value = getattr(obj, self.raw)
         except AttributeError:
-            err = message.format(getattr(self, message_attr))
-        raise error(err)
-    return wrapped
+            return False
+        setattr(obj, self.slot, self.convert(value))
+        delattr(obj, self.raw)
+        return True
+
+
+def load_lazily(self, name):
+    """The ``__getattr__`` of classes with :class:`lazy` attributes, which
+    Python only calls once the usual lookup has failed."""
+    attr = getattr(type(self), name, None)
+    if isinstance(attr, lazy):
+        return attr.load(self)
+    err = "{0!r} object has no attribute {1!r}"
+    raise AttributeError(err.format(type(self).__name__, name))
+
+
+def chunks(iterable, size):
+    """Yield lists of at most *size* consecutive items from *iterable*."""
+    iterable = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterable, size))
+        if not chunk:
+            return
+        yield chunk
+
 
+def check_fields(obj, fields):
+    """Return *fields* as a frozenset, or None if it is None, after making
+    sure that *obj* knows how to load each of them."""
+    if fields is None:
+        return None
+    fields = frozenset(fields)
+    unknown = fields.difference(obj._info_fields, obj._field_params)
+    if unknown:
+        err = "{0} has no field named {1}"
+        names = ", ".join(repr(f) for f in sorted(unknown))
+        raise ValueError(err.format(type(obj).__name__, names))
+    return fields
 
-def addprop(inst, name, method): # http://stackoverflow.com/a/2954373/1133718
-    cls = type(inst)
-    if not hasattr(cls, '__perinstance'):
-        cls = type(cls.__name__, (cls,), {})
-        cls.__perinstance = True
-        inst.__class__ = cls
-    setattr(cls, name, property(method))
+
+def field_params(obj, fields, params):
+    """Add the query parameters that *obj* needs to load *fields* to
+    *params*, and return it."""
+    for field in sorted(fields):
+        for (k, v) in obj._field_params.get(field, {}).items():
+            if isinstance(v, str):
+                params[k] = v
+            else:
+                old = params.get(k, ())
+                params[k] = old + tuple(x for x in v if x not in old)
+    return params
+
+
+def offer(q, item, stop):
+    """Put *item* in the queue *q*, unless *stop* (a threading.Event) is set
+    while waiting for room in it.
+
+    :returns: Whether *item* was put in *q*.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def prefetched(iterable, size):
+    """Iterate over *iterable* in a background thread, staying up to *size*
+    items ahead of the consumer.
+
+    Exceptions are raised in the consumer's thread once it gets to them,
+    and the background thread stops soon after the generator is closed.
+    """
+    q = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                if not offer(q, (item, None), stop):
+                    return
+        except Exception as e:
+            offer(q, (done, e), stop)
+        else:
+            offer(q, (done, None), stop)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = q.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def normalize(title, first_letter=True):
+    """Tidy up *title* like MediaWiki would on a wiki whose titles are
+    case-sensitive except for the first letter. If *first_letter* is False,
+    the case of the first letter is left alone, like it is on wikis whose
+    titles are case-sensitive throughout."""
+    title = " ".join(title.replace("_", " ").split())
+    if not first_letter:
+        return title
+    return title[:1].upper() + title[1:]
 
 
 def isostrptime(stamp):
-    """I'm lazy, and can never remember the format string"""
-    return Arrow.strptime(stamp, "%Y-%m-%dT%H:%M:%SZ")
+    """Turn a timestamp like ``2013-01-01T00:00:00Z``, which is the only
+    format that the API gives them in, into an Arrow.
+
+    Since the format never changes, this just slices it up, which is several
+    times faster than ``Arrow.strptime()``.
+    """
+    # arrow takes a while to import, and most scripts never parse a timestamp
+    from arrow import Arrow
+    if len(stamp) != 20 or stamp[19] != "Z":
+        raise ValueError("{0!r} is not a MediaWiki timestamp".format(stamp))
+    return Arrow(int(stamp[0:4]), int(stamp[5:7]), int(stamp[8:10]),
+                 int(stamp[11:13]), int(stamp[14:16]), int(stamp[17:19]))
 
-# Regex to match IPv4 and IPv6 addresses
+# Regexes to match IPv4 and IPv6 addresses. They're compiled, and cached by
+# the re module, the first time ip_address() is called.
 # I didn't write this, just google it.
-v4 = re.compile(r"\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}"
-                r"(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\b")
-v6 = re.compile(r"^\s*((([0-9A-Fa-f]{1,4}:){7}"
-                r"(([0-9A-Fa-f]{1,4})|:))|(([0-9A-Fa-f]{1,4}:){6}"
-                r"(:|((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
-                r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})"
-                r"|(:[0-9A-Fa-f]{1,4})))|(([0-9A-Fa-f]{1,4}:){5}"
-                r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
-                r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
-                r"|((:[0-9A-Fa-f]{1,4}){1,2})))|(([0-9A-Fa-f]{1,4}:){4}"
-                r"(:[0-9A-Fa-f]{1,4}){0,1}"
-                r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
-                r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
-                r"|((:[0-9A-Fa-f]{1,4}){1,2})))|(([0-9A-Fa-f]{1,4}:){3}"
-                r"(:[0-9A-Fa-f]{1,4}){0,2}"
-                r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
-                r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
-                r"|((:[0-9A-Fa-f]{1,4}){1,2})))|(([0-9A-Fa-f]{1,4}:){2}"
-                r"(:[0-9A-Fa-f]{1,4}){0,3}"
-                r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
-                r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
-                r"|((:[0-9A-Fa-f]{1,4}){1,2})))|(([0-9A-Fa-f]{1,4}:)"
-                r"(:[0-9A-Fa-f]{1,4}){0,4}"
-                r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
-                r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
-                r"|((:[0-9A-Fa-f]{1,4}){1,2})))|(:(:[0-9A-Fa-f]{1,4}){0,5}"
-                r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
-                r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
-                r"|((:[0-9A-Fa-f]{1,4}){1,2})))"
-                r"|(((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
-                r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})))(%.+)?\s*$")
+_v4 = (r"\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}"
+       r"(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\b")
+_v6 = (r"^\s*((([0-9A-Fa-f]{1,4}:){7}"
+       r"(([0-9A-Fa-f]{1,4})|:))|(([0-9A-Fa-f]{1,4}:){6}"
+       r"(:|((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
+       r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})"
+       r"|(:[0-9A-Fa-f]{1,4})))|(([0-9A-Fa-f]{1,4}:){5}"
+       r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
+       r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
+       r"|((:[0-9A-Fa-f]{1,4}){1,2})))|(([0-9A-Fa-f]{1,4}:){4}"
+       r"(:[0-9A-Fa-f]{1,4}){0,1}"
+       r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
+       r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
+       r"|((:[0-9A-Fa-f]{1,4}){1,2})))|(([0-9A-Fa-f]{1,4}:){3}"
+       r"(:[0-9A-Fa-f]{1,4}){0,2}"
+       r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
+       r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
+       r"|((:[0-9A-Fa-f]{1,4}){1,2})))|(([0-9A-Fa-f]{1,4}:){2}"
+       r"(:[0-9A-Fa-f]{1,4}){0,3}"
+       r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
+       r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
+       r"|((:[0-9A-Fa-f]{1,4}){1,2})))|(([0-9A-Fa-f]{1,4}:)"
+       r"(:[0-9A-Fa-f]{1,4}){0,4}"
+       r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
+       r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
+       r"|((:[0-9A-Fa-f]{1,4}){1,2})))|(:(:[0-9A-Fa-f]{1,4}){0,5}"
+       r"((:((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
+       r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})?)"
+       r"|((:[0-9A-Fa-f]{1,4}){1,2})))"
+       r"|(((25[0-5]|2[0-4]\d|[01]?\d{1,2})"
+       r"(\.(25[0-5]|2[0-4]\d|[01]?\d{1,2})){3})))(%.+)?\s*$")
 
 
 def ip_address(address: str):
     err = "{0!r} does not appear to be an IPv4 or IPv6 address"
-    if v4.match(address) or v6.match(address):
+    if re.match(_v4, address) or re.match(_v6, address):
         return True
     else:
         raise ValueError(err.format(address))
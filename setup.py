@@ -35,8 +35,11 @@ test_packages = ['requests_mock>=1.3.0', 'decorator>=4.1.2',
 setup(name='ceterach',
       version='0.0.1',
       packages=['ceterach'],
+      # The submodules are imported with a module __getattr__ (PEP 562)
+      python_requires='>=3.7',
       setup_requires=required_packages,
       install_requires=required_packages,
+      extras_require={'async': ['aiohttp>=3.0']},
       tests_require=test_packages,
       url='https://github.com/Riamse/ceterach',
       license='GNU Lesser General Public License v3 or later',
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from ceterach.aio import AsyncMediaWiki
+from ceterach.exceptions import ApiError
+from ceterach.store import ContentStore
+
+TEST_USER = 'Hamilton'
+
+
+def q(val):
+    """Wraps fake response data."""
+    return {'query': val}
+
+
+def _test_with(responses, num_called=1):
+    """Runs the test coroutine against a stand-in wiki that gives out
+    *responses* in order, repeating the last one forever."""
+
+    def decorator(inner):
+        def wrapped():
+            requests = []
+
+            async def handler(request):
+                params = dict(request.query)
+                params.update(await request.post())
+                requests.append(params)
+                return web.json_response(responses[min(len(requests),
+                                                       len(responses)) - 1])
+
+            async def run():
+                app = web.Application()
+                app.router.add_route('*', '/w/api.php', handler)
+                async with TestServer(app) as server:
+                    url = str(server.make_url('/w/api.php'))
+                    async with AsyncMediaWiki(url, {'sleep': 0}) as api:
+                        await inner(api)
+
+            asyncio.run(run())
+            assert len(requests) == num_called
+
+        wrapped.__name__ = inner.__name__
+        return wrapped
+
+    return decorator
+
+
+@_test_with([
+    q({'allpages': [{'title': 'A'}, {'title': 'B'}]}),
+    q({'allpages': [{'title': 'C'}]}),
+], 2)
+async def test_iterator(api):
+    titles = [p['title'] async for p in api.newiterator(list='allpages')]
+    assert titles == ['A', 'B']
+    titles = [p['title'] async for p in api.iterator(list='allpages')]
+    assert titles == ['C']
+
+
+@_test_with([
+    dict(q({'allpages': [{'title': 'A'}]}), **{'continue': {'apcontinue': 'B'}}),
+    q({'allpages': [{'title': 'B'}]}),
+], 2)
+async def test_iterator_prefetch(api):
+    titles = [p['title'] async for p in api.newiterator(list='allpages',
+                                                        prefetch=2)]
+    assert titles == ['A', 'B']
+
+
+@_test_with([
+    {'error': {'code': 'maxlag', 'info': 'Waiting for a database server'}},
+], 2)
+async def test_maxlag(api):
+    with pytest.raises(ApiError) as e:
+        await api.call(list='allpages')
+    assert e.value.code == 'maxlag'
+
+
+@_test_with([
+    q({'userinfo': {'id': 1, 'name': TEST_USER, 'rights': ['read']}}),
+    q({'users': [{'name': TEST_USER, 'editcount': 9001}]}),
+], 2)
+async def test_users(api):
+    users = [u async for u in api.users([TEST_USER])]
+    assert users[0].editcount == 9001
+
+
+@_test_with([
+    {'expandtemplates': {'*': 'Hamilton'}},
+    q({'namespaces': {'0': {'id': 0, '*': ''}, '2': {'id': 2, '*': 'User'}}}),
+], 2)
+async def test_expand_templates_namespaces(api):
+    assert api.opener is None
+    assert await api.expand_templates('API', '{{PAGENAME}}') == 'Hamilton'
+    assert await api.namespaces == {0: '', 2: 'User'}
+    # The namespaces are only asked for once
+    assert await api.namespaces == {0: '', 2: 'User'}
+
+
+@_test_with([
+    q({'userinfo': {'id': 1, 'name': TEST_USER, 'rights': ['read']}}),
+    q({'pages': {'1': {'pageid': 1, 'ns': 0, 'title': 'Noodling',
+                       'revisions': [{'revid': 5, 'parentid': 0,
+                                      'user': TEST_USER, 'comment': '',
+                                      'timestamp': '2013-01-01T00:00:00Z'}]}}}),
+], 2)
+async def test_revisions_from_store(api):
+    api.config['store'] = store = ContentStore(':memory:')
+    store.put_many([(5, 'catfish')])
+    revs = [r async for r in api.revisions([5], content=True)]
+    assert revs[0].content == 'catfish'
+
+
+@_test_with([
+    q({'allpages': [{'title': 'Apple'}, {'title': 'Fig'}]}),
+    q({'allpages': [{'title': 'Fig'}, {'title': 'Mango'}]}),
+    q({'allpages': [{'title': 'Mango'}, {'title': 'Pear'}]}),
+], 3)
+async def test_sharded_iterator(api):
+    from ceterach.shards import title_shards
+    shards = title_shards(('Fig', 'Mango'))
+    found = api.sharded_iterator(shards, list='allpages', workers=1,
+                                 ordered=True, key=lambda r: r['title'])
+    titles = [p['title'] async for p in found]
+    assert titles == ['Apple', 'Fig', 'Mango', 'Pear']
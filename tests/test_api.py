@@ -1,3 +1,10 @@
+import sys
+import hashlib
+import weakref
+import threading
+import subprocess
+
+import arrow
 import pytest
 import requests_mock
 from decorator import decorator as dec
@@ -46,6 +53,39 @@ def test_repr(api):
     assert repr(api).startswith('MediaWiki(api_url=\'' + WIKI_BASE)
 
 
+def test_lazy_imports():
+    # Importing ceterach shouldn't import the slow dependencies by itself
+    code = ("import sys, ceterach.api, ceterach.user; "
+            "print(sorted(m for m in ('requests', 'arrow') if m in sys.modules))")
+    out = subprocess.check_output([sys.executable, "-c", code])
+    assert out.decode().strip() == "[]"
+
+
+def test_star_import_without_aiohttp():
+    # aiohttp is optional, so a star import can't need it
+    code = ("import sys; sys.modules['aiohttp'] = None; "
+            "from ceterach import *; print(page.__name__, "
+            "'ceterach.aio' in sys.modules)")
+    out = subprocess.check_output([sys.executable, "-c", code])
+    assert out.decode().strip() == "ceterach.page False"
+
+
+def test_namespaces_unlocked(api):
+    done = []
+
+    def reply(request, context):
+        # Other threads can still get Pages while the namespaces load
+        t = threading.Thread(target=lambda: done.append(api.page('Foo')))
+        t.start()
+        t.join(1)
+        return q({'namespaces': {'0': {'id': 0, '*': ''}}})
+
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, WIKI_BASE, json=reply)
+        assert api.namespaces == {0: ''}
+    assert len(done) == 1
+
+
 def test_eq(api):
     assert api == c.api.MediaWiki(WIKI_BASE)
     assert api != c.api.MediaWiki(reversed(WIKI_BASE))
@@ -72,6 +112,23 @@ def test_user(api):
     assert type(user) == c.user.User
 
 
+def test_interning(api):
+    page = api.page('Foo_bar', fields={'exists'})
+    assert api.page('Foo bar', fields={'exists'}) is page
+    # The first letter is case-sensitive on some wikis
+    assert api.page('foo bar') is not page
+    assert api.page('Foo bar', follow_redirects=True) is not page
+    assert api.category('Foo bar') is not page
+    assert api.user('Some_user') is api.user('Some user')
+    # A Page that hasn't been loaded yet loads what everyone asked for
+    assert api.page('Foo bar', fields={'content'})._fields == {'exists', 'content'}
+    assert api.page('Foo bar')._fields is None
+    # Pages that aren't used anymore are forgotten
+    ref = weakref.ref(page)
+    del page
+    assert ref() is None
+
+
 def test_revision(api):
     rev = api.revision(1)
     assert rev.revid == 1
@@ -125,3 +182,387 @@ def test_namespaces(api):
 @_test_for({})
 def test_logout(api):
     assert api.logout()
+
+
+def _page(pageid, title, text, **extra):
+    """Fake page data, as returned by Page.load_attributes's query."""
+    page = {'pageid': pageid, 'ns': 0, 'title': title, 'lastrevid': pageid,
+            'revisions': [{'user': TEST_USER, '*': text}]}
+    page.update(extra)
+    return page
+
+
+@_test_for([
+    q({'userinfo': {'id': 1, 'name': TEST_USER, 'rights': ['read']}}),
+    q({'normalized': [{'from': 'noodling', 'to': TEST_PAGE}],
+       'pages': {'1': _page(1, TEST_PAGE, 'catfish'),
+                 '-1': {'ns': 0, 'title': 'Missing', 'missing': ''},
+                 '-2': {'title': 'Bad[', 'invalid': ''}}}),
+], 2)
+def test_pages(api):
+    missing = api.page('Missing')
+    pages = list(api.pages(['noodling', missing, 'Bad[']))
+    assert [p.title for p in pages] == [TEST_PAGE, 'Missing', 'Bad[']
+    assert pages[1] is missing
+    assert pages[0].content == 'catfish'
+    assert pages[0].revision_user.name == TEST_USER
+    assert not missing.exists
+
+
+@_test_for([
+    q({'userinfo': {'id': 1, 'name': TEST_USER, 'rights': ['read']}}),
+    q({'pages': {'2': _page(2, 'Redirect', '#REDIRECT [[Target]]',
+                            redirect='')}}),
+    q({'pages': {'3': _page(3, 'Target', 'text')}}),
+], 3)
+def test_pages_follow_redirects(api):
+    page, = api.pages([2], follow_redirects=True)
+    assert page.title == 'Target'
+    assert page.content == 'text'
+
+
+@_test_for([
+    q({'userinfo': {'id': 1, 'name': TEST_USER, 'rights': ['read']}}),
+    q({'users': [{'name': TEST_USER, 'userid': 1, 'editcount': 9001},
+                 {'name': 'Nobody', 'missing': ''}]}),
+], 2)
+def test_users(api):
+    users = list(api.users([TEST_USER.lower(), 'Nobody']))
+    assert [u.name for u in users] == [TEST_USER, 'Nobody']
+    assert users[0].editcount == 9001
+    assert not users[1].exists
+
+
+@_test_for([
+    q({'userinfo': {'id': 1, 'name': TEST_USER, 'rights': ['read']}}),
+    q({'badrevids': {'3': {'revid': 3}},
+       'pages': {'1': {'pageid': 1, 'ns': 0, 'title': TEST_PAGE,
+                       'revisions': [
+                           {'revid': 2, 'parentid': 1, 'user': TEST_USER,
+                            'timestamp': '2013-01-01T00:00:00Z',
+                            'comment': 'two'},
+                           {'revid': 1, 'parentid': 0, 'user': TEST_USER,
+                            'timestamp': '2013-01-01T00:00:00Z',
+                            'comment': 'one', 'minor': ''}]}}}),
+], 2)
+def test_revisions(api):
+    revs = list(api.revisions([1, 2, 3]))
+    assert [r.revid for r in revs] == [1, 2, 3]
+    assert revs[0].is_minor and revs[0].prev_revision is None
+    assert revs[1].summary == 'two' and revs[1].prev_revision == revs[0]
+    assert revs[1].page.pageid == 1
+    # Timestamps are parsed when they're first read
+    assert revs[1]._raw_timestamp == '2013-01-01T00:00:00Z'
+    assert revs[1].timestamp == arrow.Arrow(2013, 1, 1)
+    # ... and then they're read from their slot like anything else
+    assert revs[1]._timestamp is revs[1].timestamp
+    assert not hasattr(revs[1], '_raw_timestamp')
+    with pytest.raises(ValueError):
+        c.utils.isostrptime('2013-01-01 00:00:00')
+
+
+@_test_for([
+    q({'userinfo': {'id': 1, 'name': TEST_USER, 'rights': ['read']}}),
+    q({'users': [{'name': TEST_USER, 'editcount': 1},
+                 {'name': 'Burr', 'editcount': 2}]}),
+], 2)
+def test_batch(api):
+    with api.batch():
+        hamilton, burr = api.user(TEST_USER), api.user('Burr')
+        assert burr.editcount == 2
+        assert hamilton.editcount == 1
+
+
+def test_batch_revisions():
+    rvprops = []
+
+    def reply(request, context):
+        if 'meta' in request.qs:
+            return q({'userinfo': {'id': 1, 'name': TEST_USER}})
+        rvprops.append(request.qs['rvprop'][0].split('|'))
+        revs = [{'revid': int(r), 'parentid': 0, 'user': TEST_USER, '*': 'x'}
+                for r in request.qs['revids'][0].split('|')]
+        return q({'pages': {'1': {'pageid': 1, 'ns': 0, 'title': TEST_PAGE,
+                                  'revisions': revs}}})
+
+    api = c.api.MediaWiki('http://a.wiki/w/api.php')
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, 'http://a.wiki/w/api.php',
+                         json=reply)
+        with api.batch():
+            one, two = api.revision(1), api.revision(2)
+            assert one.user.name == TEST_USER
+            three, four = api.revision(3), api.revision(4)
+            assert three.content == 'x'
+            # The others were loaded along with them
+            assert two.user.name == TEST_USER and four.content == 'x'
+    # Reading the user doesn't download the content
+    assert len(rvprops) == 2
+    assert 'content' not in rvprops[0] and 'content' in rvprops[1]
+
+
+def test_query_pages_continue():
+    sent = []
+    replies = [
+        {'continue': {'clcontinue': '1|b', 'plcontinue': '1|0|x',
+                      'continue': '||'},
+         'query': {'pages': {'1': {'categories': [{'title': 'Category:A'}],
+                                   'links': [{'title': 'W'}]}}}},
+        # The categories are finished before the links are
+        {'continue': {'plcontinue': '1|0|y', 'continue': '||'},
+         'query': {'pages': {'1': {'categories': [{'title': 'Category:B'}],
+                                   'links': [{'title': 'X'}]}}}},
+        {'query': {'pages': {'1': {'links': [{'title': 'Y'}]}}}},
+    ]
+
+    def reply(request, context):
+        sent.append(request.qs.get('clcontinue', [None])[0])
+        return replies[len(sent) - 1]
+
+    api = c.api.MediaWiki('http://a.wiki/w/api.php')
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, 'http://a.wiki/w/api.php',
+                         json=reply)
+        query = api._query_pages({'prop': ('categories', 'links'),
+                                  'pageids': 1})
+    assert sent == [None, '1|b', None]
+    page = query['pages']['1']
+    assert [l['title'] for l in page['categories']] == ['Category:A',
+                                                        'Category:B']
+    assert [l['title'] for l in page['links']] == ['W', 'X', 'Y']
+
+
+@_test_for([
+    q({'pages': {'1': {'pageid': 1, 'ns': 0, 'title': TEST_PAGE,
+                       'lastrevid': 1}}}),
+    q({'pages': {'1': _page(1, TEST_PAGE, 'catfish')}}),
+], 2)
+def test_page_fields(api):
+    p = api.page(TEST_PAGE, fields={'exists', 'revid'})
+    assert p._load_params() == {'prop': ('info',)}
+    assert api.page(TEST_PAGE, fields={'content'})._load_params()['rvprop'] \
+        == ('ids', 'content')
+    assert p.exists and p.revid == 1
+    # Anything that wasn't asked for is loaded in full
+    assert p.content == 'catfish'
+    with pytest.raises(ValueError):
+        api.page(TEST_PAGE, fields={'colour'})
+    assert api.file('File:A.png', fields={'url'})._load_params()['prop'] \
+        == ('info', 'imageinfo')
+    assert api.revision(1, fields={'user'})._load_params()['rvprop'] \
+        == ('ids', 'user')
+
+
+_current = q({'pages': {'1': {
+    'pageid': 1, 'ns': 0, 'title': TEST_PAGE,
+    'revisions': [{'timestamp': '2013-01-01T00:00:00Z',
+                   'sha1': hashlib.sha1(b'catfish').hexdigest()}]}}})
+
+
+@_test_for([
+    _current,
+    _current,
+    {'edit': {'result': 'Success', 'title': TEST_PAGE, 'newrevid': 2}},
+], 3)
+def test_edit_nochange(api):
+    api._tokens['csrf'] = TEST_TOKEN
+    p = api.page(TEST_PAGE)
+    # Neither of these are sent
+    assert 'nochange' in p.edit('catfish')['edit']
+    assert 'nochange' in p.append('', force=True)['edit']
+    assert 'nochange' not in p.edit('catfish!')['edit']
+    assert p.revid == 2
+
+
+@_test_for([
+    {'continue': {'gcmcontinue': 'page|B', 'continue': 'gcmcontinue||'},
+     'batchcomplete': '',
+     'query': {'pages': {'1': _page(1, TEST_PAGE, 'catfish')}}},
+    # Category:Fish's revision only comes with the next response
+    {'continue': {'rvcontinue': '2', 'continue': '||'},
+     'query': {'pages': {'2': {'pageid': 2, 'ns': 14, 'title': 'Category:Fish',
+                               'lastrevid': 2},
+                         '3': {'pageid': 3, 'ns': 6, 'title': 'File:Fish.png',
+                               'lastrevid': 3,
+                               'revisions': [{'user': TEST_USER}]}}}},
+    dict(q({'pages': {'2': {'pageid': 2, 'ns': 14, 'title': 'Category:Fish',
+                            'revisions': [{'user': TEST_USER}]}}}),
+         batchcomplete=''),
+    q({'pages': {'2': {'pageid': 2, 'ns': 14, 'title': 'Category:Fish',
+                       'lastrevid': 2,
+                       'revisions': [{'user': TEST_USER, '*': 'fish'}]}}}),
+], 4)
+def test_category_iter_members(api):
+    cat = api.category('Category:Noodling')
+    members = cat.iter_members(types=('page', 'subcat', 'file'))
+    page = next(members)
+    assert page.title == TEST_PAGE and page.content == 'catfish'
+    subcat, file = members
+    assert isinstance(subcat, c.category.Category)
+    assert isinstance(file, c.file.File)
+    assert subcat.revision_user.name == TEST_USER
+    # The content wasn't asked for, so it is loaded now
+    assert subcat.content == 'fish'
+
+
+@_test_for([
+    q({'pages': {'-1': {'title': 'Cat|fish', 'invalid': ''},
+                 '2': {'pageid': 2, 'ns': 14, 'title': 'Category:B'},
+                 '3': {'pageid': 3, 'ns': 0, 'title': TEST_PAGE}}}),
+    q({'pages': {'1': {'pageid': 1, 'ns': 14, 'title': 'Category:A'},
+                 '3': {'pageid': 3, 'ns': 0, 'title': TEST_PAGE},
+                 '4': {'pageid': 4, 'ns': 0, 'title': 'Catfish'}}}),
+    q({'pages': {'2': {'pageid': 2, 'ns': 14, 'title': 'Category:B'},
+                 '3': {'pageid': 3, 'ns': 0, 'title': TEST_PAGE}}}),
+], 3)
+def test_category_walk(api):
+    cat = api.category('Category:A')
+    walked = list(cat.walk(workers=1))
+    # Category:A is in Category:B, which is in Category:A
+    assert [p.title for p in walked] == ['Category:B', TEST_PAGE, 'Catfish']
+    assert [p.title for p in cat.walk(0, namespaces=[0])] == [TEST_PAGE]
+
+
+def _history(*revids, **extra):
+    """Fake revisions of TEST_PAGE, with *extra* in each."""
+    revs = [dict({'revid': r, 'parentid': r - 1, 'user': TEST_USER,
+                  'timestamp': '2013-01-01T00:00:00Z', 'comment': ''},
+                 **extra) for r in revids]
+    return {'1': {'pageid': 1, 'ns': 0, 'title': TEST_PAGE, 'revisions': revs}}
+
+
+@_test_for([
+    {'query-continue': {'revisions': {'rvcontinue': 1}},
+     'query': {'pages': _history(3, 2)}},
+    q({'userinfo': {'id': 1, 'name': TEST_USER, 'rights': ['read']}}),
+    q({'pages': _history(3, 2, **{'*': 'fish'})}),
+    q({'pages': _history(1)}),
+    q({'pages': _history(1, **{'*': 'fish'})}),
+], 5)
+def test_iter_history(api):
+    history = api.page(TEST_PAGE).iter_history(content=True)
+    assert [r.revid for r in history] == [3, 2, 1]
+
+
+@_test_for(q({'pages': _history(2, 1)}), 1)
+def test_iter_history_lazy(api):
+    history = api.page(TEST_PAGE).iter_history(props=('user',))
+    rev = next(history)
+    assert rev.user.name == TEST_USER and rev.prev_revision.revid == 1
+    assert not hasattr(rev, '_content') and not hasattr(rev, '_is_deleted')
+
+
+@_test_for([
+    dict(q({'allpages': [{'title': 'A'}]}), **{'continue': {'apcontinue': 'B'}}),
+    dict(q({'allpages': [{'title': 'B'}]}), **{'continue': {'apcontinue': 'C'}}),
+    {'error': {'code': 'internal_api_error', 'info': 'Oops'}},
+], 3)
+def test_iterator_prefetch(api):
+    it = api.newiterator(list='allpages', prefetch=1)
+    assert next(it)['title'] == 'A'
+    assert next(it)['title'] == 'B'
+    with pytest.raises(c.exceptions.CeterachError):
+        next(it)
+
+
+def test_sharded_iterator():
+    from ceterach.shards import title_shards, time_shards, pageid_shards
+    titles = ['Apple', 'Fig', 'Kiwi', 'Mango', 'Pear']
+
+    def allpages(request, context):
+        qs = request.qs
+        # requests_mock lowercases the query string
+        low, high = qs.get('apfrom', [''])[0], qs.get('apto', ['~'])[0]
+        return q({'allpages': [{'title': t} for t in titles
+                               if low <= t.lower() <= high]})
+
+    api = c.api.MediaWiki('http://a.wiki/w/api.php')
+    shards = title_shards(('Fig', 'Mango'))
+    assert shards == [{'apto': 'Fig'}, {'apfrom': 'Fig', 'apto': 'Mango'},
+                      {'apfrom': 'Mango'}]
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, 'http://a.wiki/w/api.php',
+                         json=allpages)
+        key = lambda r: r['title']
+        found = api.sharded_iterator(shards, list='allpages', ordered=True,
+                                     key=key)
+        assert [p['title'] for p in found] == titles
+        found = api.sharded_iterator(shards, list='allpages', key=key)
+        assert sorted(p['title'] for p in found) == titles
+        assert rqm.call_count == 6
+    assert time_shards('2013-01-01T00:00:00Z', '2013-01-01T00:00:09Z', 2) == [
+        {'rcstart': '2013-01-01T00:00:09Z', 'rcend': '2013-01-01T00:00:04Z'},
+        {'rcstart': '2013-01-01T00:00:03Z', 'rcend': '2013-01-01T00:00:00Z'},
+    ]
+    assert pageid_shards(1, 6, 3) == [{'pageids': [1, 2, 3]},
+                                      {'pageids': [4, 5]}]
+
+
+@_test_for([
+    dict(q({'allpages': [{'title': 'A'}, {'title': 'B'}]}),
+         **{'continue': {'apcontinue': 'C', 'continue': '-||'}}),
+    q({'allpages': [{'title': 'C'}, {'title': 'D'}]}),
+    q({'allpages': [{'title': 'C'}, {'title': 'D'}]}),
+], 3)
+def test_iterator_checkpoint(api, tmp_path):
+    path = str(tmp_path / 'allpages.json')
+    state = {}
+    it = api.newiterator(list='allpages', continuation=state, checkpoint=path)
+    assert [next(it)['title'] for _ in range(3)] == ['A', 'B', 'C']
+    it.close()
+    # C was never finished with, so it's yielded again
+    assert state == {'continue': {'apcontinue': 'C', 'continue': '-||'},
+                     'offset': 0}
+    it = api.newiterator(list='allpages', checkpoint=path)
+    assert [p['title'] for p in it] == ['C', 'D']
+    assert not (tmp_path / 'allpages.json').exists()
+
+
+@_test_for([
+    {'continue': {'clcontinue': '1|Fish', 'continue': 'gapcontinue||'},
+     'query': {'allusers': [{'name': TEST_USER}],
+               'pages': {'1': {'pageid': 1, 'title': TEST_PAGE,
+                               'categories': [{'title': 'Category:Catfish'}]},
+                         '2': {'pageid': 2, 'title': 'Catfish'}}}},
+    {'batchcomplete': '',
+     'continue': {'gapcontinue': 'D', 'continue': 'gapcontinue||'},
+     'query': {'pages': {'1': {'pageid': 1, 'title': TEST_PAGE,
+                               'categories': [{'title': 'Category:Fish'}]},
+                         '2': {'pageid': 2, 'title': 'Catfish'}}}},
+    {'batchcomplete': '',
+     'query': {'pages': {'3': {'pageid': 3, 'title': 'Dace'}}}},
+], 3)
+def test_newiterator_merge(api):
+    items = list(api.newiterator(generator='allpages', prop='categories',
+                                 list='allusers', merge=True))
+    assert items[0] == {'name': TEST_USER}
+    assert [p['title'] for p in items[1:]] == [TEST_PAGE, 'Catfish', 'Dace']
+    assert [cat['title'] for cat in items[1]['categories']] == \
+        ['Category:Catfish', 'Category:Fish']
+
+
+@_test_for([
+    {'batchcomplete': '',
+     'query': {'pages': {'1': _page(1, TEST_PAGE, 'catfish',
+                                    categories=[{'title': 'Category:Fish'}]),
+                         '2': _page(2, 'File:Fish.png', 'a fish', ns=6,
+                                    imageinfo=[{'url': 'x', 'mime': 'y',
+                                                'sha1': 'z', 'size': 1,
+                                                'user': TEST_USER,
+                                                'width': 1, 'height': 2}])}}},
+], 1)
+def test_iter_pages(api):
+    page, file = api.iter_pages('allpages', gapnamespace=0)
+    assert page.content == 'catfish' and page.categories[0].title == 'Category:Fish'
+    assert isinstance(file, c.file.File) and file.dimensions == (1, 2)
+
+
+@_test_for([
+    q({'userinfo': {'id': 1, 'name': TEST_USER, 'rights': ['read']}}),
+    q({'allusers': [{'name': TEST_USER}, {'name': 'Burr'}]}),
+    q({'users': [{'name': TEST_USER, 'editcount': 1},
+                 {'name': 'Burr', 'editcount': 2}]}),
+], 3)
+def test_iter_users(api):
+    users = api.iter_users('allusers')
+    assert [u.editcount for u in users] == [1, 2]
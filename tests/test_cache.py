@@ -0,0 +1,89 @@
+import hashlib
+
+import requests_mock
+
+import ceterach as c
+from ceterach.cache import ResponseCache
+
+WIKI_BASE = 'mock://a.wiki/w/api.php'
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    for i in range(3):
+        cache.set(('k', i), {}, {'n': i})
+    assert cache.get(('k', 0)) is None
+    assert cache.get(('k', 2)) == {'n': 2}
+    assert len(cache) == 2
+
+
+def test_invalidate_by_title():
+    cache = ResponseCache()
+    cache.set('by param', {'titles': 'Noodling|Catfish'}, {})
+    cache.set('by result', {}, {'query': {'categorymembers': [
+        {'ns': 0, 'title': 'Noodling'}]}})
+    cache.set('unrelated', {}, {'query': {'pages': []}})
+    cache.invalidate('noodling')
+    assert cache.get('by param') is None and cache.get('by result') is None
+    assert cache.get('unrelated') == {'query': {'pages': []}}
+
+
+def test_call_uses_cache():
+    cache = ResponseCache()
+    api = c.api.MediaWiki(WIKI_BASE, {'cache': cache})
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, WIKI_BASE, json={'query': {}})
+        for _ in range(3):
+            res = api.call(meta='siteinfo', use_defaults=False)
+            res['query']['mutated'] = True
+        api.call(action='purge', titles='Noodling', use_defaults=False)
+        api.call(action='purge', titles='Noodling', use_defaults=False)
+        assert rqm.call_count == 3
+    assert cache.hits == 2
+
+
+def _current(text):
+    return {'query': {'pages': {'1': {
+        'pageid': 1, 'ns': 0, 'title': 'Noodling',
+        'revisions': [{'timestamp': '2013-01-01T00:00:00Z',
+                       'sha1': hashlib.sha1(text.encode()).hexdigest()}]}}}}
+
+
+def test_edit_conflicts_not_cached():
+    api = c.api.MediaWiki(WIKI_BASE, {'cache': ResponseCache()})
+    api._tokens['csrf'] = 'TEST_TOKEN'
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, WIKI_BASE, [
+            {'json': _current('catfish')},
+            {'json': _current('dogfish')},
+            {'json': {'edit': {'result': 'Success', 'title': 'Noodling',
+                               'newrevid': 2}}},
+        ])
+        p = api.page('Noodling')
+        assert 'nochange' in p.edit('catfish')['edit']
+        # Someone else has edited the page since, which the cache can't know
+        assert 'nochange' not in p.edit('catfish')['edit']
+        assert rqm.call_count == 3
+
+
+def test_edit_by_pageid_invalidates():
+    api = c.api.MediaWiki(WIKI_BASE, {'cache': ResponseCache()})
+    api._tokens['csrf'] = 'TEST_TOKEN'
+
+    def info(lastrevid):
+        return {'json': {'query': {'pages': {'1': {
+            'pageid': 1, 'ns': 0, 'title': 'Noodling',
+            'lastrevid': lastrevid}}}}}
+
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, WIKI_BASE, [
+            info(1),
+            {'json': {'edit': {'result': 'Success', 'title': 'Noodling',
+                               'pageid': 1, 'newrevid': 2}}},
+            info(2),
+        ])
+        read = lambda: api.call(prop='info', pageids=1, use_defaults=False)
+        assert read()['query']['pages']['1']['lastrevid'] == 1
+        api.page(1).edit('catfish', force=True)
+        assert read()['query']['pages']['1']['lastrevid'] == 2
+        assert rqm.call_count == 3
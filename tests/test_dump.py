@@ -0,0 +1,97 @@
+import bz2
+import gzip
+
+import pytest
+import requests_mock
+
+import ceterach as c
+
+DUMP = '''<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">
+  <siteinfo><sitename>Wiki</sitename></siteinfo>
+  <page>
+    <title>Noodling</title>
+    <ns>0</ns>
+    <id>1</id>
+    <revision>
+      <id>1</id>
+      <timestamp>2013-01-01T00:00:00Z</timestamp>
+      <contributor><username>Hamilton</username><id>1</id></contributor>
+      <comment>one</comment>
+      <text xml:space="preserve">catfish</text>
+    </revision>
+    <revision>
+      <id>3</id>
+      <parentid>1</parentid>
+      <timestamp>2013-01-02T00:00:00Z</timestamp>
+      <contributor><ip>127.0.0.1</ip></contributor>
+      <minor />
+      <text deleted="deleted" />
+    </revision>
+  </page>
+  <page>
+    <title>Category:Fish</title>
+    <ns>14</ns>
+    <id>2</id>
+    <redirect title="Noodling" />
+    <revision>
+      <id>2</id>
+      <timestamp>2013-01-01T00:00:00Z</timestamp>
+      <contributor deleted="deleted" />
+      <text xml:space="preserve">#REDIRECT [[Noodling]]</text>
+    </revision>
+  </page>
+</mediawiki>
+'''
+
+
+@pytest.fixture
+def api():
+    with requests_mock.mock() as rqm:
+        yield c.api.MediaWiki('mock://a.wiki/w/api.php')
+    # Everything comes from the dump
+    assert rqm.call_count == 0
+
+
+@pytest.fixture(params=['', '.gz', '.bz2'])
+def dump(request, tmp_path):
+    opener = {'': open, '.gz': gzip.open, '.bz2': bz2.open}[request.param]
+    path = tmp_path / ('dump.xml' + request.param)
+    with opener(str(path), 'wb') as f:
+        f.write(DUMP.encode('utf-8'))
+    return str(path)
+
+
+def test_parse(dump):
+    res = list(c.dump.parse(dump))
+    assert [r['revisions'][0]['revid'] for r in res] == [1, 3, 2]
+    assert res[0]['title'] == 'Noodling' and 'lastrevid' not in res[0]
+    assert res[1]['lastrevid'] == 3 and '*' not in res[1]['revisions'][0]
+    assert [r['pageid'] for r in c.dump.parse(dump, latest=True)] == [1, 2]
+
+
+def test_pages(api, dump):
+    noodling, fish = c.dump.pages(api, dump)
+    assert noodling.revid == 3 and noodling.revision_user.name == '127.0.0.1'
+    assert type(fish) is c.category.Category
+    assert fish.is_redirect and fish.namespace == 14
+    assert fish.content == '#REDIRECT [[Noodling]]'
+
+
+def test_revisions(api, dump):
+    one, three, two = c.dump.revisions(api, dump)
+    assert one.content == 'catfish' and one.summary == 'one'
+    assert one.user.name == 'Hamilton' and not one.is_minor
+    assert three.prev_revision.revid == 1 and three.is_minor
+    assert three.is_deleted
+    assert one.page is three.page and one.page.title == 'Noodling'
+    assert two.page.is_redirect
+
+
+def test_processes(api, tmp_path):
+    paths = []
+    for i in range(3):
+        paths.append(str(tmp_path / 'dump{}.xml.gz'.format(i)))
+        with gzip.open(paths[-1], 'wb') as f:
+            f.write(DUMP.encode('utf-8'))
+    revids = [r.revid for r in c.dump.revisions(api, paths, processes=2)]
+    assert sorted(revids) == [1, 1, 1, 2, 2, 2, 3, 3, 3]
@@ -0,0 +1,71 @@
+import requests_mock
+
+import ceterach as c
+from ceterach.store import ContentStore
+
+WIKI_BASE = 'mock://a.wiki/w/api.php'
+
+
+def _revision(revid, text=None):
+    rev = {'revid': revid, 'parentid': 0, 'user': 'Hamilton',
+           'timestamp': '2013-01-01T00:00:00Z', 'comment': ''}
+    if text is not None:
+        rev['*'] = text
+    return {'query': {'pages': {'1': {'pageid': 1, 'ns': 0, 'title': 'Noodling',
+                                      'revisions': [rev]}}}}
+
+
+def test_store_roundtrip(tmp_path):
+    store = ContentStore(str(tmp_path / 'content.db'))
+    store.put_many([(1, 'catfish'), (2, 'ナマズ')])
+    assert len(store) == 2 and 2 in store and 3 not in store
+    assert store.get_many([1, 2, 3]) == {1: 'catfish', 2: 'ナマズ'}
+    store.close()
+    assert ContentStore(store.path).get(1) == 'catfish'
+
+
+def test_revision_content_is_stored(tmp_path):
+    store = ContentStore(str(tmp_path / 'content.db'))
+    api = c.api.MediaWiki(WIKI_BASE, {'store': store})
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, WIKI_BASE,
+                         [{'json': _revision(5, 'catfish')},
+                          {'json': _revision(5)}])
+        assert api.revision(5).content == 'catfish'
+        assert store.get(5) == 'catfish'
+        # The second time around, the content comes from the store
+        assert api.revision(5).content == 'catfish'
+        assert rqm.call_count == 2
+
+
+def test_page_content_only_missing(tmp_path):
+    store = ContentStore(str(tmp_path / 'content.db'))
+    api = c.api.MediaWiki(WIKI_BASE, {'store': store})
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, WIKI_BASE,
+                         [{'json': _revision(5)},
+                          {'json': {'query': {'userinfo': {'rights': []}}}},
+                          {'json': _revision(5, 'catfish')},
+                          {'json': _revision(5)}])
+        assert api.page('Noodling').content == 'catfish'
+        assert store.get(5) == 'catfish'
+        assert api.page('Noodling').content == 'catfish'
+        assert rqm.call_count == 4
+
+
+def test_revisions_cold_store(tmp_path):
+    store = ContentStore(str(tmp_path / 'content.db'))
+    url = 'http://a.wiki/w/api.php'
+    api = c.api.MediaWiki(url, {'store': store})
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, url,
+                         [{'json': {'query': {'userinfo': {'rights': []}}}},
+                          {'json': _revision(5, 'catfish')},
+                          {'json': _revision(5)}])
+        # Nothing is stored yet, so the content is asked for straight away
+        [rev] = api.revisions([5], content=True)
+        assert rev.content == 'catfish' and rqm.call_count == 2
+        assert 'content' in rqm.request_history[1].qs['rvprop'][0]
+        [rev] = api.revisions([5], content=True)
+        assert rev.content == 'catfish' and rqm.call_count == 3
+        assert 'content' not in rqm.request_history[2].qs['rvprop'][0]
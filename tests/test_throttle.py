@@ -0,0 +1,65 @@
+import pytest
+import requests_mock
+
+import ceterach as c
+from ceterach.throttle import AdaptiveLimiter, TokenBucket
+
+WIKI_BASE = 'mock://a.wiki/w/api.php'
+
+
+def test_token_bucket_unlimited():
+    bucket = TokenBucket()
+    assert all(bucket.reserve() == 0 for _ in range(100))
+
+
+def test_token_bucket_burst():
+    bucket = TokenBucket(rate=10, burst=3)
+    delays = [bucket.reserve() for _ in range(5)]
+    assert delays[:3] == [0, 0, 0]
+    assert delays[3] == pytest.approx(0.1, abs=0.01)
+    assert delays[4] == pytest.approx(0.2, abs=0.01)
+
+
+def test_rates_config():
+    api = c.api.MediaWiki(WIKI_BASE, {
+        'throttle': 0.5,
+        'rates': {'read': (20, 5), 'write': None},
+    })
+    read, write = api._limiter(True), api._limiter(False)
+    assert (read.rate, read.burst) == (20, 5)
+    assert (write.rate, write.burst) == (2, 1)
+
+
+def test_throttle_is_shared():
+    api = c.api.MediaWiki(WIKI_BASE, {'throttle': 0.5})
+    read, write = api._limiter(True), api._limiter(False)
+    # One request every half second, whether it's a read or a write
+    assert read is write and (read.rate, read.burst) == (2, 1)
+
+
+def test_limiter_backs_off_and_recovers():
+    limiter = AdaptiveLimiter(rate=10, concurrency=4)
+    limiter.lagged(6.0, 0)
+    state = limiter.state
+    assert state['lag'] == 6.0
+    assert state['rate'] == 5 and state['concurrency'] == 2
+    for _ in range(20):
+        limiter.succeeded()
+    assert limiter.state['rate'] == 10
+    assert limiter.state['concurrency'] == 4
+
+
+def test_maxlag_updates_limiter():
+    api = c.api.MediaWiki(WIKI_BASE, {'sleep': 0})
+    lagged = {'error': {'code': 'maxlag', 'lag': 7,
+                        'info': 'Waiting for 10.0.0.1: 7 seconds lagged'}}
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, WIKI_BASE, [
+            {'json': lagged, 'headers': {'Retry-After': '0'}},
+            {'json': {'query': {}}},
+        ])
+        assert api.call(use_defaults=False) == {'query': {}}
+        assert rqm.call_count == 2
+    state = api.limiters['read'].state
+    assert state['lag'] == 7
+    assert state['rate'] < float('inf')
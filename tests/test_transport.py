@@ -0,0 +1,108 @@
+import json
+import time
+
+import pytest
+import requests_mock
+
+import ceterach as c
+
+WIKI_BASE = 'mock://a.wiki/w/api.php'
+LAGGED = {'error': {'code': 'maxlag', 'info': 'Waiting: 3 seconds lagged',
+                    'lag': 3}}
+# So that the rate is still fast after it's cut for the maxlag error
+RATES = {'read': (1000, 10), 'write': (1000, 10)}
+
+
+def _allpages(titles, cont=None):
+    res = {'query': {'allpages': [{'title': t} for t in titles]}}
+    if cont:
+        res['continue'] = {'apcontinue': cont, 'continue': '-||'}
+    return res
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = str(tmp_path / 'bot.jsonl')
+    responses = [
+        {'json': LAGGED, 'headers': {'retry-after': '0'}},
+        {'json': _allpages(['A'], 'B')},
+        {'json': _allpages(['B'])},
+    ]
+    transport = c.transport.Recording(path)
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, WIKI_BASE, responses)
+        api = c.api.MediaWiki(WIKI_BASE, {'transport': transport, 'rates': RATES})
+        titles = [p['title'] for p in api.newiterator(list='allpages')]
+    transport.close()
+    assert titles == ['A', 'B'] and rqm.call_count == 3
+    return path
+
+
+def test_recording(recording):
+    with open(recording) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 3
+    assert records[0]['result'] == LAGGED
+    assert records[0]['headers']['Retry-After'] == '0'
+    assert records[2]['params']['apcontinue'] == 'B'
+
+
+def test_replay(recording):
+    api = c.api.MediaWiki(WIKI_BASE, {
+        'transport': c.transport.Replay(recording), 'rates': RATES,
+    })
+    with requests_mock.mock() as rqm:
+        # The maxlag error is replayed and retried, then the continuation
+        titles = [p['title'] for p in api.newiterator(list='allpages')]
+        assert titles == ['A', 'B']
+        # The last response to a query is repeated
+        titles = [p['title'] for p in api.newiterator(list='allpages')]
+        assert titles == ['A', 'B']
+        with pytest.raises(c.exceptions.ApiError):
+            api.call(list='allusers')
+    assert rqm.call_count == 0
+
+
+def test_replay_latency(recording):
+    api = c.api.MediaWiki(WIKI_BASE, {
+        'transport': c.transport.Replay(recording, latency=0.05),
+        'rates': RATES,
+    })
+    before = time.monotonic()
+    assert [p['title'] for p in api.newiterator(list='allpages')] == ['A', 'B']
+    assert time.monotonic() - before >= 0.15
+
+
+def test_recording_leaves_out_session(tmp_path):
+    path = str(tmp_path / 'bot.jsonl')
+    transport = c.transport.Recording(path)
+    login = {'login': {'result': 'NeedToken', 'token': 'secret',
+                       'sessionid': 'secret'}}
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, WIKI_BASE, [
+            {'json': login, 'headers': {'Set-Cookie': 'session=secret'}},
+            {'json': {'login': {'result': 'Success'}}},
+        ])
+        api = c.api.MediaWiki(WIKI_BASE, {'transport': transport})
+        assert api.login('Hamilton', 'secret')
+    transport.close()
+    with open(path) as f:
+        assert 'secret' not in f.read()
+    # The login can still be replayed
+    api = c.api.MediaWiki(WIKI_BASE, {'transport': c.transport.Replay(path)})
+    assert api.login('Hamilton', 'hunter2')
+
+
+def test_replay_ignores_volatile(tmp_path):
+    path = str(tmp_path / 'bot.jsonl')
+    transport = c.transport.Recording(path)
+    with requests_mock.mock() as rqm:
+        rqm.register_uri(requests_mock.ANY, WIKI_BASE, json={'edit': {}})
+        transport.request(WIKI_BASE, {'starttimestamp': '1'}, False)
+    transport.close()
+    replay = c.transport.Replay(path)
+    assert replay.request(WIKI_BASE, {'starttimestamp': '2'}, False)[0] == \
+        {'edit': {}}
+    with pytest.raises(c.exceptions.ApiError):
+        c.transport.Replay(path, ignore=()).request(
+            WIKI_BASE, {'starttimestamp': '2'}, False)